@@ -1,272 +1,35 @@
 # app.py
 
+import hashlib
+import os
+import time
+
 import streamlit as st
 import pandas as pd
-import graphviz
-import re
 
+from ll1 import (
+    NULL_PROFILE,
+    TREE_MAX_NODES,
+    AnalysisCache,
+    IncrementalAnalysis,
+    Profile,
+    TimedHandler,
+    TraceStore,
+    TreeBuilder,
+    analyze_grammar_text,
+    dot_to_svg,
+    find_conflicts,
+    generate_parser,
+    grammar_key,
+    run_parse,
+    select_tree_nodes,
+    table_entries,
+    tree_dot_lines,
+)
 
-# ——————————————————————————
-# 1. Scanner y parseo de la gramática
-# ——————————————————————————
-def scan_grammar(text, empty_sym):
-    """
-    Tokeniza cada línea de la gramática en símbolos:
-    tokens: '->', '|', símbolo vacío, identificadores alfanuméricos.
-    """
-    rules = []
-    for line in text.splitlines():
-        line = line.strip()
-        if not line:
-            continue
-        # Regex para flecha, barra, símbolo vacío o identificadores
-        pattern = r"->|\||%s|[A-Za-z0-9_]+" % re.escape(empty_sym)
-        tokens = re.findall(pattern, line)
-        rules.append(tokens)
-    return rules
-
-
-def parse_grammar_with_scanner(text, empty_sym):
-    raw_rules = scan_grammar(text, empty_sym)
-    grammar = {}
-    for tokens in raw_rules:
-        # tokens: [lhs, '->', sym1, sym2, '|', sym3, ...]
-        lhs = tokens[0]
-        # Validación de convención: LHS en minúscula
-        if not lhs.islower():
-            raise ValueError(f"El LHS `{lhs}` debe ser minúscula (no-terminal)")
-        prods = []
-        curr = []
-        for tok in tokens[2:]:
-            if tok == "|":
-                prods.append(curr)
-                curr = []
-            else:
-                curr.append(tok)
-        prods.append(curr)
-        grammar[lhs] = prods
-    return grammar
 
-
-# ——————————————————————————
-# 2. Algoritmo FIRST
 # ——————————————————————————
-def compute_first(grammar, empty_sym):
-    first = {nt: set() for nt in grammar}
-    changed = True
-    while changed:
-        changed = False
-        for A, prods in grammar.items():
-            for prod in prods:
-                all_nullable = True
-                for sym in prod:
-                    if sym == empty_sym:
-                        if empty_sym not in first[A]:
-                            first[A].add(empty_sym)
-                            changed = True
-                        all_nullable = False
-                        break
-                    if sym not in grammar:  # terminal
-                        if sym not in first[A]:
-                            first[A].add(sym)
-                            changed = True
-                        all_nullable = False
-                        break
-                    # no terminal
-                    for s in first[sym] - {empty_sym}:
-                        if s not in first[A]:
-                            first[A].add(s)
-                            changed = True
-                    if empty_sym not in first[sym]:
-                        all_nullable = False
-                        break
-                if all_nullable and empty_sym not in first[A]:
-                    first[A].add(empty_sym)
-                    changed = True
-    return first
-
-
-# ——————————————————————————
-# 3. Algoritmo FOLLOW
-# ——————————————————————————
-def compute_follow(grammar, first, empty_sym):
-    follow = {nt: set() for nt in grammar}
-    start = next(iter(grammar))
-    follow[start].add("$")
-    changed = True
-    while changed:
-        changed = False
-        for A, prods in grammar.items():
-            for prod in prods:
-                for i, B in enumerate(prod):
-                    if B in grammar:
-                        beta = prod[i + 1 :]
-                        first_beta = set()
-                        nullable = True
-                        for sym in beta:
-                            if sym == empty_sym:
-                                first_beta.add(empty_sym)
-                                continue
-                            if sym not in grammar:
-                                first_beta.add(sym)
-                                nullable = False
-                                break
-                            first_beta |= first[sym] - {empty_sym}
-                            if empty_sym in first[sym]:
-                                nullable = True
-                            else:
-                                nullable = False
-                                break
-                        # añade FIRST(beta) \ {ε} a FOLLOW(B)
-                        for t in first_beta - {empty_sym}:
-                            if t not in follow[B]:
-                                follow[B].add(t)
-                                changed = True
-                        # si beta vacío o nullable, añade FOLLOW(A)
-                        if not beta or nullable:
-                            for t in follow[A]:
-                                if t not in follow[B]:
-                                    follow[B].add(t)
-                                    changed = True
-    return follow
-
-
-# ——————————————————————————
-# 4. Construir tabla LL(1)
-# ——————————————————————————
-def compute_first_of_string(symbols, grammar, first, empty_sym):
-    result = set()
-    nullable = True
-    for sym in symbols:
-        if sym == empty_sym:
-            result.add(empty_sym)
-            break
-        if sym not in grammar:
-            result.add(sym)
-            nullable = False
-            break
-        result |= first[sym] - {empty_sym}
-        if empty_sym in first[sym]:
-            continue
-        else:
-            nullable = False
-            break
-    if nullable:
-        result.add(empty_sym)
-    return result
-
-
-def compute_parse_table(grammar, first, follow, empty_sym):
-    terminals = sorted(
-        {t for prods in grammar.values() for prod in prods for t in prod if t not in grammar and t != empty_sym}
-    )
-    terminals.append("$")
-    table = {A: {t: None for t in terminals} for A in grammar}
-    for A, prods in grammar.items():
-        for prod in prods:
-            first_alpha = compute_first_of_string(prod, grammar, first, empty_sym)
-            for t in first_alpha - {empty_sym}:
-                table[A][t] = prod
-            if empty_sym in first_alpha:
-                for t in follow[A]:
-                    table[A][t] = prod
-    return table, terminals
-
-
-# ——————————————————————————
-# 5. Simulación de parsing LL(1)
-# ——————————————————————————
-def simulate_ll1(grammar, table, tokens, start):
-    stack = ["$", start]
-    tokens = tokens + ["$"]
-    i = 0
-    trace = []
-    while True:
-        top = stack.pop()
-        current = tokens[i]
-        trace.append({"Stack": " ".join(stack + [top]), "Input": " ".join(tokens[i:]), "Action": ""})
-        if top in grammar:
-            prod = table[top].get(current)
-            if not prod:
-                trace[-1]["Action"] = f"Error: no regla para {top} con {current}"
-                break
-            trace[-1]["Action"] = f"{top} → {' '.join(prod)}"
-            if prod != [empty_sym_input]:
-                for sym in reversed(prod):
-                    stack.append(sym)
-        else:
-            if top == current:
-                trace[-1]["Action"] = f"Match {current}"
-                i += 1
-            else:
-                trace[-1]["Action"] = f"Error: expected {top}, got {current}"
-                break
-        if top == "$" and current == "$":
-            trace[-1]["Action"] = "Aceptado"
-            break
-        if len(trace) > 1000:
-            break
-    return trace
-
-
-# ——————————————————————————
-# 6. Construir Árbol de Derivación
-# ——————————————————————————
-class Node:
-    def __init__(self, symbol):
-        self.symbol = symbol
-        self.children = []
-
-
-def build_parse_tree(grammar, table, tokens, start, empty_sym):
-    tokens = tokens + ["$"]
-    i = 0
-
-    def recurse(sym):
-        nonlocal i
-        node = Node(sym)
-        if sym not in grammar:
-            if sym == tokens[i]:
-                i += 1
-            return node
-        prod = table[sym].get(tokens[i])
-        if not prod:
-            return node
-        for s in prod:
-            if s == empty_sym:
-                node.children.append(Node(empty_sym))
-            else:
-                child = recurse(s)
-                node.children.append(child)
-        return node
-
-    return recurse(start)
-
-
-def tree_to_dot(node, dot=None):
-    if dot is None:
-        dot = graphviz.Digraph(node_attr={"style": "filled", "shape": "box"})
-    uid = str(id(node))
-
-    # Determinar estilo del nodo según su tipo
-    if node.symbol.islower() and node.symbol != empty_sym_input:  # No-terminal
-        dot.node(uid, node.symbol, fillcolor="lightblue")
-    elif node.symbol == empty_sym_input:  # Símbolo vacío
-        dot.node(uid, node.symbol, fillcolor="lightyellow")
-    elif node.symbol == "$":  # Fin de cadena
-        dot.node(uid, node.symbol, fillcolor="lightgrey")
-    else:  # Terminal
-        dot.node(uid, node.symbol, fillcolor="lightgreen")
-
-    for child in node.children:
-        cid = str(id(child))
-        dot.edge(uid, cid)
-        tree_to_dot(child, dot)
-    return dot
-
-
-# ——————————————————————————
-# 7. Estilos e inicialización
+# 1. Estilos e inicialización
 # ——————————————————————————
 def set_page_config():
     st.set_page_config(page_title="Simulador LL(1)", page_icon="📚", layout="wide", initial_sidebar_state="expanded")
@@ -354,6 +117,14 @@ def create_card(title, content):
     )
 
 
+# Pasos de la traza que se muestran por página en la pestaña de simulación
+TRACE_PAGE_SIZE = 200
+# Tabla LL(1): filas por página en cuadrícula y en la lista de celdas; por
+# encima de TABLE_GRID_MAX_CELLS celdas se abre la lista por defecto
+TABLE_GRID_PAGE_SIZE = 50
+TABLE_LIST_PAGE_SIZE = 200
+TABLE_GRID_MAX_CELLS = 5000
+
 # Ejemplos de gramáticas para el usuario
 EXAMPLE_GRAMMARS = {
     "Expresiones Aritméticas": """expr -> term expr_tail
@@ -374,8 +145,102 @@ b -> num""",
 
 
 # ——————————————————————————
-# 8. Interfaz Streamlit Principal
+# 2. Interfaz Streamlit Principal
 # ——————————————————————————
+@st.cache_resource
+def get_analysis_cache():
+    # Una sola instancia por proceso, compartida por todas las sesiones
+    return AnalysisCache(directory=os.environ.get("LL1_CACHE_DIR"))
+
+
+def analyze_for_session(text, empty_sym, profile=NULL_PROFILE):
+    """
+    Análisis con caché; si falla, se re-analiza de forma incremental a partir
+    de la última gramática de esta sesión (solo cambian las reglas editadas).
+    Con un Profile activo se hace el análisis completo para medir cada fase.
+    """
+    cache = get_analysis_cache()
+    key = grammar_key(text, empty_sym)
+    if profile.enabled:
+        results = analyze_grammar_text(text, empty_sym, profile)
+        cache.put(key, results)
+        return results
+    results = cache.get(key)
+    if results is not None:
+        return results
+    session = st.session_state.get("incremental")
+    if session is None or session.empty_sym != empty_sym:
+        session = st.session_state.incremental = IncrementalAnalysis({}, empty_sym)
+        session.update_text(text)
+        results = session.results()
+        cache.put(key, results)
+        return results
+    # Tras una edición no se guarda en la caché: serializar los resultados
+    # cuesta más que el propio update, y la sesión ya los tiene
+    session.update_text(text)
+    return session.results()
+
+
+def table_frames(table, terminals):
+    """
+    La tabla LL(1) como DataFrames, cada uno construido de una vez: en
+    cuadrícula (una fila por no-terminal) y en formato largo (solo las
+    celdas con producción). Se guardan en la sesión hasta el siguiente
+    análisis, para no rehacerlos al cambiar de página o de filtro.
+    """
+    frames = st.session_state.get("table_frames")
+    if frames is None:
+        rows = [["" if prod is None else " ".join(prod) for prod in map(row.get, terminals)] for row in table.values()]
+        grid = pd.DataFrame(rows, index=pd.Index(list(table), name="No Terminal"), columns=terminals)
+        cells = pd.DataFrame(table_entries(table, terminals), columns=["No Terminal", "Terminal", "Producción"])
+        frames = st.session_state.table_frames = (grid, cells)
+    return frames
+
+
+def paginate(df, page_size, label, key):
+    """Solo la página elegida de df: el resto no se envía al navegador."""
+    n_pages = max(1, -(-len(df) // page_size))
+    page = 1
+    if n_pages > 1:
+        # La clave incluye n_pages para volver a la primera página si cambia el filtro
+        page = st.number_input(f"{label} (de {n_pages})", 1, n_pages, 1, key=f"{key}_{n_pages}")
+    first_row = (page - 1) * page_size
+    return df.iloc[first_row : first_row + page_size]
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def generated_parser(analysis_key, style, _grammar, _table, _terminals, empty_sym, start):
+    """
+    Código del parser generado, cacheado por (gramática, estilo): generarlo
+    compila la tabla entera y no debe repetirse en cada rerun de la página.
+    """
+    return generate_parser(_grammar, _table, _terminals, empty_sym, style, start)
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def render_tree(tree_key, view, empty_sym, _parse_tree):
+    """
+    DOT y SVG de una vista del árbol, cacheados por (gramática, entrada,
+    vista): al volver a la pestaña no se repite el layout. Devuelve también
+    los subárboles colapsados, como (índice, etiqueta). svg es None si el
+    programa dot de Graphviz no está instalado.
+    """
+    max_depth, max_nodes, expanded = view
+    source = "".join(tree_dot_lines(_parse_tree, empty_sym, 0, max_depth, max_nodes, set(expanded)))
+    try:
+        svg = dot_to_svg(source)
+        # Sin la cabecera XML, para incrustarlo en la página
+        svg = svg[svg.find("<svg") :]
+    except Exception:
+        svg = None
+    sizes = _parse_tree.subtree_sizes()
+    collapsed = [
+        (node, f"{_parse_tree.symbols[_parse_tree.symbol[node]]} (nodo {node}, {sizes[node] - 1} nodos ocultos)")
+        for node in sorted(select_tree_nodes(_parse_tree, 0, max_depth, max_nodes, set(expanded))[1])
+    ]
+    return source, svg, collapsed
+
+
 def main():
     set_page_config()
     apply_custom_css()
@@ -396,6 +261,10 @@ def main():
     with st.sidebar:
         st.header("⚙️ Configuración")
         empty_sym_input = st.text_input("Símbolo para cadena vacía:", "ε", help="Símbolo que representa ε (epsilon)")
+        profiling = st.checkbox(
+            "⏱️ Medir rendimiento",
+            help="Mide cada fase del análisis, la simulación y el árbol (panel Rendimiento).",
+        )
 
         st.header("📋 Ejemplos de Gramáticas")
         example_choice = st.radio(
@@ -453,31 +322,29 @@ def main():
             )
             st.stop()
 
-        if process_grammar or "grammar" in st.session_state:
+        if process_grammar or "analysis" in st.session_state:
             try:
+                # Cada "Procesar" con medición activa empieza un informe nuevo
+                if profiling and (process_grammar or "profile" not in st.session_state):
+                    st.session_state.profile = Profile()
+                profile = st.session_state.profile if profiling else NULL_PROFILE
+
                 # Guardar resultados en session_state para mantenerlos entre pestañas
-                if process_grammar or "grammar" not in st.session_state:
-                    grammar = parse_grammar_with_scanner(grammar_input, empty_sym_input)
-                    first = compute_first(grammar, empty_sym_input)
-                    follow = compute_follow(grammar, first, empty_sym_input)
-                    table, terminals = compute_parse_table(grammar, first, follow, empty_sym_input)
-                    start = next(iter(grammar))
-
-                    # Guardar resultados
-                    st.session_state.grammar = grammar
-                    st.session_state.first = first
-                    st.session_state.follow = follow
-                    st.session_state.table = table
-                    st.session_state.terminals = terminals
-                    st.session_state.start = start
-                else:
-                    # Recuperar resultados
-                    grammar = st.session_state.grammar
-                    first = st.session_state.first
-                    follow = st.session_state.follow
-                    table = st.session_state.table
-                    terminals = st.session_state.terminals
-                    start = st.session_state.start
+                if process_grammar or "analysis" not in st.session_state:
+                    st.session_state.analysis = analyze_for_session(grammar_input, empty_sym_input, profile)
+                    st.session_state.analysis_key = grammar_key(grammar_input, empty_sym_input)
+                    st.session_state.pop("simulation", None)
+                    st.session_state.pop("table_frames", None)
+
+                # Recuperar resultados
+                results = st.session_state.analysis
+                grammar = results["grammar"]
+                first = results["first"]
+                follow = results["follow"]
+                table = results["table"]
+                terminals = results["terminals"]
+                start = results["start"]
+                stats = results["stats"]
 
                 # Mostrar resultados en pestañas
                 result_tabs = st.tabs(
@@ -495,16 +362,20 @@ def main():
                         st.subheader("Conjuntos FOLLOW")
                         for A in grammar:
                             st.markdown(f"**FOLLOW({A})** = {{ {', '.join(sorted(follow[A]))} }}")
+                    st.caption(
+                        f"Pasos de propagación: anulables {stats['nullable_steps']}, "
+                        f"FIRST {stats['first_steps']}, FOLLOW {stats['follow_steps']}"
+                    )
+                    if "changed" in stats:
+                        st.caption(
+                            f"Reanálisis incremental: {stats['changed']} reglas cambiadas, "
+                            f"{stats['rows']} filas de la tabla recalculadas"
+                        )
 
                 # Pestaña Tabla LL(1)
                 with result_tabs[1]:
                     st.subheader("Tabla de Análisis LL(1)")
-                    df = pd.DataFrame(index=grammar.keys(), columns=terminals)
-                    for A in grammar:
-                        for t in terminals:
-                            prod = table[A].get(t)
-                            df.loc[A, t] = " ".join(prod) if prod else ""
-                    df.index.name = "No Terminal"
+                    grid_df, cells_df = table_frames(table, terminals)
 
                     # Mejorar visualización de la tabla
                     st.markdown(
@@ -523,7 +394,70 @@ def main():
                             return "background-color: #e6fff2"
                         return ""
 
-                    st.dataframe(df.style.applymap(highlight_nonempty), use_container_width=True)
+                    table_view = st.radio(
+                        "Vista:",
+                        ["Cuadrícula", "Lista de celdas"],
+                        index=int(grid_df.size > TABLE_GRID_MAX_CELLS),
+                        horizontal=True,
+                        help="La lista solo incluye las celdas con producción y se puede filtrar.",
+                    )
+                    if table_view == "Cuadrícula":
+                        # Solo se estiliza y se envía la página visible
+                        page_df = paginate(grid_df, TABLE_GRID_PAGE_SIZE, "Página de la tabla", "table_page")
+                        st.dataframe(page_df.style.applymap(highlight_nonempty), use_container_width=True)
+                    else:
+                        col1, col2, col3 = st.columns(3)
+                        with col1:
+                            selected_nonterminals = st.multiselect("No terminales:", list(table))
+                        with col2:
+                            selected_terminals = st.multiselect("Terminales:", terminals)
+                        with col3:
+                            search = st.text_input("Buscar en la producción:")
+                        view_df = cells_df
+                        if selected_nonterminals:
+                            view_df = view_df[view_df["No Terminal"].isin(selected_nonterminals)]
+                        if selected_terminals:
+                            view_df = view_df[view_df["Terminal"].isin(selected_terminals)]
+                        if search:
+                            view_df = view_df[view_df["Producción"].str.contains(search, regex=False)]
+                        st.caption(
+                            f"{len(view_df)} de {len(cells_df)} celdas con producción "
+                            f"({grid_df.size} celdas en la tabla)"
+                        )
+                        page_df = paginate(view_df, TABLE_LIST_PAGE_SIZE, "Página de celdas", "cells_page")
+                        st.dataframe(page_df, hide_index=True, use_container_width=True)
+
+                    conflicts = find_conflicts(grammar, first, follow, empty_sym_input)
+                    if conflicts:
+                        st.warning(
+                            "La gramática no es LL(1): "
+                            + "; ".join(
+                                f"M[{A}, {t}] = " + " | ".join(" ".join(prod) for prod in prods)
+                                for A, t, prods in conflicts
+                            )
+                        )
+
+                    # Parser independiente (sin Streamlit) para usar en producción
+                    parser_style = st.radio(
+                        "Parser generado:",
+                        ["table", "descent"],
+                        format_func=lambda s: "Dirigido por tabla" if s == "table" else "Descenso recursivo",
+                        horizontal=True,
+                    )
+                    st.download_button(
+                        "⬇️ Descargar parser (.py)",
+                        generated_parser(
+                            st.session_state.analysis_key,
+                            parser_style,
+                            grammar,
+                            table,
+                            terminals,
+                            empty_sym_input,
+                            start,
+                        ),
+                        file_name=f"parser_{start}.py",
+                        mime="text/x-python",
+                    )
 
                 # Pestaña Simulación y Árbol
                 with result_tabs[2], result_tabs[3]:
@@ -534,25 +468,80 @@ def main():
                         )
                     with col2:
                         simulate_button = st.button("▶️ Simular", type="primary", use_container_width=True)
+                    use_lexer = st.checkbox(
+                        "Tokenizar con el lexer de la gramática",
+                        help=(
+                            "Permite escribir la entrada sin espacios (p. ej. x+y*2); "
+                            "id y num se reconocen por clase."
+                        ),
+                    )
 
+                    tokens = None
                     if simulate_button and token_input:
-                        tokens = token_input.split()
+                        # Tabla compilada y lexer se construyen la primera vez que se simula
+                        compiled = results["compiled"]
+                        try:
+                            tokens = list(results["lexer"].tokenize(token_input)) if use_lexer else token_input.split()
+                        except ValueError as e:
+                            # Error de la entrada, no de la gramática: se informa aquí y las pestañas siguen
+                            st.session_state.pop("simulation", None)
+                            with result_tabs[2]:
+                                create_info_box(f"❌ No se pudo tokenizar la entrada: {str(e)}", "warning")
+
+                    if tokens is not None:
+                        # Una sola pasada del parser alimenta la traza y el árbol
+                        trace_store = TraceStore(compiled, tokens)
+                        tree_builder = TreeBuilder(compiled)
+                        if profile.enabled:
+                            # El árbol se cronometra aparte; "simulation" queda como driver y traza,
+                            # para que el total no cuente dos veces el tiempo del árbol
+                            tree_timer = TimedHandler(tree_builder)
+                            start_time = time.perf_counter()
+                            success, error_pos = run_parse(compiled, tokens, trace_store, tree_timer)
+                            seconds = time.perf_counter() - start_time - tree_timer.seconds
+                            profile.record("simulation", seconds, tokens=len(tokens), steps=len(trace_store))
+                            profile.record("tree", tree_timer.seconds, nodes=len(tree_builder.tree))
+                        else:
+                            success, error_pos = run_parse(compiled, tokens, trace_store, tree_builder)
+                        # La traza se detiene en el primer error; la recuperación informa de todos
+                        errors = [] if success else compiled.diagnose(tokens)
+                        # Se guarda para poder paginar la traza sin volver a simular
+                        input_key = hashlib.sha256("\0".join(tokens).encode("utf-8")).hexdigest()
+                        tree_key = (st.session_state.analysis_key, input_key)
+                        st.session_state.simulation = (
+                            trace_store, tree_builder.tree, success, error_pos, tree_key, errors
+                        )
+                        st.session_state.tree_expanded = set()
+
+                    if "simulation" in st.session_state:
+                        trace_store, parse_tree, success, error_pos, tree_key, errors = st.session_state.simulation
 
                         # Simulación (en pestaña 2)
                         with result_tabs[2]:
                             st.subheader("Traza de la Simulación")
-                            trace = simulate_ll1(grammar, table, tokens, start)
-
-                            # Colorear la tabla según el resultado
-                            success = any(action == "Aceptado" for step in trace for action in step.values())
 
                             if success:
                                 create_info_box("✅ La cadena de entrada ha sido aceptada por la gramática.", "success")
                             else:
-                                create_info_box("❌ La cadena de entrada contiene errores sintácticos.", "warning")
-
-                            # Mostrar la tabla de traza
-                            trace_df = pd.DataFrame(trace)
+                                create_info_box(
+                                    f"❌ La cadena de entrada contiene errores sintácticos (token {error_pos + 1}).",
+                                    "warning",
+                                )
+                                errors_df = pd.DataFrame(
+                                    [(pos + 1, message, " ".join(expected)) for pos, message, expected in errors],
+                                    columns=["Token", "Error", "Esperado"],
+                                )
+                                st.markdown(f"**Errores encontrados ({len(errors)})**")
+                                st.dataframe(errors_df, use_container_width=True, hide_index=True)
+
+                            # Mostrar la tabla de traza, una página cada vez
+                            n_pages = max(1, -(-len(trace_store) // TRACE_PAGE_SIZE))
+                            page = 1
+                            if n_pages > 1:
+                                page = st.number_input(f"Página de la traza (de {n_pages})", 1, n_pages, 1)
+                            first_step = (page - 1) * TRACE_PAGE_SIZE
+                            steps = trace_store[first_step : first_step + TRACE_PAGE_SIZE]
+                            trace_df = pd.DataFrame(steps, index=range(first_step, first_step + len(steps)))
                             st.dataframe(trace_df, use_container_width=True)
 
                         # Árbol (en pestaña 3)
@@ -560,8 +549,19 @@ def main():
                             st.subheader("Árbol de Derivación")
 
                             try:
-                                tree = build_parse_tree(grammar, table, tokens, start, empty_sym_input)
-                                dot = tree_to_dot(tree)
+                                # Vista: profundidad, presupuesto de nodos y subárboles expandidos a mano
+                                col1, col2 = st.columns(2)
+                                with col1:
+                                    max_depth = st.number_input("Profundidad máxima (0 = sin límite):", 0, value=0)
+                                with col2:
+                                    max_nodes = st.number_input(
+                                        "Máximo de nodos (0 = sin límite):", 0, value=TREE_MAX_NODES
+                                    )
+                                expanded = st.session_state.setdefault("tree_expanded", set())
+                                view = (max_depth or None, max_nodes or None, tuple(sorted(expanded)))
+                                with profile.phase("dot") as metrics:
+                                    dot, svg, collapsed = render_tree(tree_key, view, empty_sym_input, parse_tree)
+                                metrics.update(nodes=len(parse_tree), collapsed=len(collapsed))
 
                                 # Leyenda para los colores
                                 st.markdown(
@@ -576,10 +576,54 @@ def main():
                                     unsafe_allow_html=True,
                                 )
 
-                                st.graphviz_chart(dot, use_container_width=True)
+                                if svg is not None:
+                                    st.markdown(f'<div style="overflow: auto;">{svg}</div>', unsafe_allow_html=True)
+                                else:
+                                    st.graphviz_chart(dot, use_container_width=True)
+
+                                if collapsed:
+                                    st.caption(
+                                        f"{len(collapsed)} subárboles colapsados (borde discontinuo) "
+                                        f"de un árbol de {len(parse_tree)} nodos."
+                                    )
+                                    col1, col2 = st.columns([3, 1])
+                                    with col1:
+                                        node = st.selectbox(
+                                            "Subárbol colapsado:", collapsed, format_func=lambda item: item[1]
+                                        )
+                                    with col2:
+                                        st.button(
+                                            "➕ Expandir",
+                                            on_click=expanded.add,
+                                            args=(node[0],),
+                                            use_container_width=True,
+                                        )
+                                if expanded:
+                                    st.button("➖ Colapsar lo expandido", on_click=expanded.clear)
+                                st.download_button(
+                                    "⬇️ Descargar vista (.dot)",
+                                    dot,
+                                    file_name="arbol.dot",
+                                    mime="text/vnd.graphviz",
+                                )
                             except Exception as e:
                                 create_info_box(f"No se pudo generar el árbol: {str(e)}", "warning")
 
+                if profiling:
+                    with st.expander("⏱️ Rendimiento"):
+                        report = profile.to_dict()
+                        if report["phases"]:
+                            st.dataframe(pd.DataFrame(report["phases"]).set_index("phase"), use_container_width=True)
+                            st.caption(f"Tiempo total medido: {report['total_seconds'] * 1000:.1f} ms")
+                            st.download_button(
+                                "⬇️ Descargar JSON",
+                                profile.to_json(),
+                                file_name="rendimiento.json",
+                                mime="application/json",
+                            )
+                        else:
+                            st.info("Pulsa «Procesar Gramática» para medir el análisis.")
+
             except Exception as e:
                 st.error(f"Error al procesar la gramática: {str(e)}")
                 st.info("Verifica que tu gramática cumpla con el formato requerido.")
@@ -0,0 +1,368 @@
+# bench.py
+"""
+Benchmarks del pipeline LL(1) con gramáticas y entradas sintéticas.
+
+    python bench.py                          # suite completa, JSON a stdout
+    python bench.py --quick -o actual.json   # suite reducida
+    python bench.py --baseline base.json     # compara con una ejecución guardada
+
+Cada caso varía un eje (nº de no-terminales, longitud de producción,
+profundidad de cadenas anulables o de recursión) respecto a una gramática
+base. Las fases first/follow/table son los algoritmos con conjuntos;
+analysis es GrammarAnalysis (conjuntos de bits) y analyze el pipeline
+completo desde el texto, que es lo que usan la app, la CLI y el servidor.
+generated[table] y generated[descent] son los parsers de generate_parser,
+junto a parse y simulate. Cada fase se cronometra por separado (mínimo y
+mediana de --repeat ejecuciones) y el pico de memoria se mide en una ejecución aparte con
+tracemalloc, para no distorsionar los tiempos. El caso cli mide el
+arranque en frío de cli.py en procesos nuevos, y el caso scan la carga de
+una gramática de SCAN_RULES reglas, con una alternativa por línea.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import ll1
+
+EMPTY = "ε"
+BASE_CASE = {"nonterminals": 50, "production_length": 4, "nullable_depth": 2, "recursion_depth": 4}
+AXES = {
+    "nonterminals": [50, 200, 800],
+    "production_length": [2, 8, 16],
+    "nullable_depth": [1, 4, 8],
+    "recursion_depth": [2, 8, 32],
+}
+TOKEN_LENGTHS = [100, 1000]
+# Reglas de la gramática del caso scan (cargar ficheros generados muy grandes)
+SCAN_RULES = 100_000
+QUICK_SCAN_RULES = 20_000
+QUICK_AXES = {
+    "nonterminals": [20, 80],
+    "production_length": [2, 8],
+    "nullable_depth": [1, 4],
+    "recursion_depth": [2, 8],
+}
+QUICK_TOKEN_LENGTHS = [100]
+# Duración mínima de cada muestra cronometrada
+MIN_SAMPLE_S = 0.05
+# Por encima de este cociente actual/base una fase se marca como regresión
+DEFAULT_THRESHOLD = 1.25
+
+
+# ——————————————————————————
+# Generadores
+# ——————————————————————————
+def make_grammar(nonterminals=50, production_length=4, nullable_depth=2, recursion_depth=4, seed=0):
+    """
+    Gramática LL(1) sintética con símbolo inicial s:
+
+        s  -> n0 C s | ε
+        ni -> Ki <unidad> ... <unidad> | ε
+
+    Cada unidad es una cadena de hasta nullable_depth no-terminales
+    distintos (todos anulables) seguida del terminal C. Los no-terminales se
+    reparten en recursion_depth niveles; cada uno usa los del nivel
+    siguiente y el último vuelve al primero, de modo que el ciclo de
+    recursión tiene esa longitud. Como Ki solo abre la producción de ni y
+    cada cadena acaba en C, la gramática es LL(1) por construcción.
+    """
+    r = random.Random(seed)
+    names = [f"n{i}" for i in range(nonterminals)]
+    levels = max(1, min(recursion_depth, nonterminals))
+    by_level = [[] for _ in range(levels)]
+    for i, A in enumerate(names):
+        by_level[i * levels // nonterminals].append(A)
+    grammar = {"s": [["n0", "C", "s"], [EMPTY]]}
+    for i, A in enumerate(names):
+        callees = by_level[(i * levels // nonterminals + 1) % levels]
+        body = [f"K{i}"]
+        for _ in range(production_length):
+            body += r.sample(callees, r.randint(1, min(nullable_depth, len(callees))))
+            body.append("C")
+        grammar[A] = [body, [EMPTY]]
+    return grammar
+
+
+def grammar_to_text(grammar, split=False):
+    """Texto de la gramática; con split, una línea por alternativa (el LHS se repite)."""
+    if split:
+        return "\n".join(f"{A} -> " + " ".join(prod) for A, prods in grammar.items() for prod in prods)
+    return "\n".join(f"{A} -> " + " | ".join(" ".join(prod) for prod in prods) for A, prods in grammar.items())
+
+
+def sample_tokens(grammar, length, seed=0, empty_sym=EMPTY):
+    """
+    Cadena válida de unos length terminales: derivación más a la izquierda
+    que, mientras quede presupuesto, elige casi siempre una producción no
+    vacía al azar (y a veces cualquiera, para variar la forma del árbol; el
+    símbolo inicial nunca se vacía antes de tiempo); a partir de ahí cada
+    no-terminal toma la producción con menos no-terminales.
+    """
+    r = random.Random(seed)
+    shortest = {A: min(prods, key=lambda p: sum(s in grammar for s in p)) for A, prods in grammar.items()}
+    # Las producciones pueden ser listas o tuplas (parse_grammar_lines)
+    growing = {A: [p for p in prods if list(p) != [empty_sym]] or prods for A, prods in grammar.items()}
+    start = next(iter(grammar))
+    tokens = []
+    stack = [start]
+    while stack:
+        sym = stack.pop()
+        if sym not in grammar:
+            if sym != empty_sym:
+                tokens.append(sym)
+            continue
+        if len(tokens) + len(stack) >= length:
+            prod = shortest[sym]
+        else:
+            prod = r.choice(growing[sym] if sym == start or r.random() < 0.8 else grammar[sym])
+        stack.extend(reversed(prod))
+    return tokens
+
+
+# ——————————————————————————
+# Medición
+# ——————————————————————————
+def measure(fn, repeat):
+    """
+    (resultado, tiempos por llamada en segundos, pico de memoria en bytes)
+    de fn(). Las fases muy cortas se repiten dentro de cada muestra hasta
+    durar al menos MIN_SAMPLE_S, como hace timeit.
+    """
+    start = time.perf_counter()
+    result = fn()
+    number = max(1, int(MIN_SAMPLE_S / max(time.perf_counter() - start, 1e-9)))
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, times, peak
+
+
+def run_case(name, params, token_lengths, repeat):
+    grammar = make_grammar(**params)
+    text = grammar_to_text(grammar)
+    records = []
+
+    def phase(label, fn, **extra):
+        result, times, peak = measure(fn, repeat)
+        records.append(
+            {
+                "case": name,
+                "params": params,
+                "phase": label,
+                "min_s": min(times),
+                "median_s": statistics.median(times),
+                "peak_bytes": peak,
+                **extra,
+            }
+        )
+        return result
+
+    grammar = phase("scan", lambda: ll1.parse_grammar_with_scanner(text, EMPTY))
+    first = phase("first", lambda: ll1.compute_first(grammar, EMPTY))
+    follow = phase("follow", lambda: ll1.compute_follow(grammar, first, EMPTY))
+    table, terminals = phase("table", lambda: ll1.compute_parse_table(grammar, first, follow, EMPTY))
+    # Lo que usan la app, la CLI y el servidor: conjuntos de bits y el pipeline completo desde el texto
+    phase("analysis", lambda: analyze_with_bitsets(grammar))
+    phase("analyze", lambda: ll1.analyze_grammar_text(text, EMPTY))
+    compiled = phase("compile", lambda: ll1.CompiledTable(grammar, table, terminals, EMPTY))
+    generated = {style: load_generated_parser(grammar, table, terminals, style) for style in ("table", "descent")}
+    for length in token_lengths:
+        tokens = sample_tokens(grammar, length)
+        accepted, pos = compiled.recognize(tokens)
+        if not accepted:
+            raise RuntimeError(f"{name}: la entrada generada se rechaza en el token {pos}")
+        extra = {"tokens": len(tokens)}
+        phase(f"parse[{length}]", lambda: compiled.parse(tokens), **extra)
+        phase(f"simulate[{length}]", lambda: ll1.simulate_ll1(grammar, table, tokens, "s", EMPTY), **extra)
+        for style, parse in generated.items():
+            if parse(tokens)[1] is not None:
+                raise RuntimeError(f"{name}: el parser generado ({style}) rechaza la entrada: {parse(tokens)[1]}")
+            phase(f"generated[{style}][{length}]", lambda: parse(tokens), **extra)
+        phase(f"tree[{length}]", lambda: ll1.build_parse_tree(grammar, table, tokens, "s", EMPTY), **extra)
+    return records
+
+
+def analyze_with_bitsets(grammar):
+    """Lo que hace analyze_grammar_text tras el scan: GrammarAnalysis y sus tres salidas."""
+    analysis = ll1.GrammarAnalysis(grammar, EMPTY)
+    table, terminals = analysis.parse_table()
+    return analysis.first_sets(), analysis.follow_sets(), table, terminals
+
+
+def load_generated_parser(grammar, table, terminals, style):
+    """parse() del módulo de generate_parser, cargado sin escribirlo a disco."""
+    namespace = {"__name__": f"parser_{style}"}
+    exec(compile(ll1.generate_parser(grammar, table, terminals, EMPTY, style), f"<parser {style}>", "exec"), namespace)
+    return namespace["parse"]
+
+
+def run_cold_start(repeat):
+    """
+    Arranque en frío de la CLI: cada muestra es un proceso nuevo de Python
+    (importar ll1 y analizar o parsear con la gramática base).
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    grammar = make_grammar(**BASE_CASE)
+    tokens = " ".join(sample_tokens(grammar, 100))
+    records = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "grammar.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(grammar_to_text(grammar))
+        commands = {
+            "import": ([sys.executable, "-c", "import ll1"], None),
+            "analyze": ([sys.executable, os.path.join(here, "cli.py"), "analyze", path], None),
+            "parse": ([sys.executable, os.path.join(here, "cli.py"), "parse", path], tokens),
+        }
+        for label, (command, stdin) in commands.items():
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                subprocess.run(command, input=stdin, cwd=here, check=True, capture_output=True, text=True)
+                times.append(time.perf_counter() - start)
+            records.append(
+                {
+                    "case": "cli",
+                    "params": {},
+                    "phase": f"cold_start[{label}]",
+                    "min_s": min(times),
+                    "median_s": statistics.median(times),
+                    "peak_bytes": None,
+                }
+            )
+    return records
+
+
+def run_scan(rules, repeat):
+    """Carga de una gramática grande desde texto y desde fichero (línea a línea)."""
+    grammar = make_grammar(nonterminals=rules)
+    text = grammar_to_text(grammar, split=True)
+    params = {"rules": rules + 1, "lines": text.count("\n") + 1, "bytes": len(text.encode("utf-8"))}
+    records = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "grammar.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        phases = {
+            "scan[text]": lambda: ll1.parse_grammar_with_scanner(text, EMPTY),
+            "scan[file]": lambda: ll1.parse_grammar_file(path, EMPTY),
+        }
+        for label, fn in phases.items():
+            result, times, peak = measure(fn, repeat)
+            if len(result) != len(grammar):
+                raise RuntimeError(f"scan: {len(result)} reglas en lugar de {len(grammar)}")
+            records.append(
+                {
+                    "case": "scan",
+                    "params": params,
+                    "phase": label,
+                    "min_s": min(times),
+                    "median_s": statistics.median(times),
+                    "peak_bytes": peak,
+                }
+            )
+    return records
+
+
+def suite(axes):
+    """Casos: la gramática base y, por cada eje, una variante por valor."""
+    cases = [("base", dict(BASE_CASE))]
+    for axis, values in axes.items():
+        for value in values:
+            if value != BASE_CASE[axis]:
+                cases.append((f"{axis}={value}", dict(BASE_CASE, **{axis: value})))
+    return cases
+
+
+def compare(results, baseline, threshold):
+    """Imprime la comparación con baseline; devuelve las fases que empeoran más que threshold."""
+    previous = {(r["case"], r["phase"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"{'caso':<24} {'fase':<16} {'base (s)':>10} {'actual (s)':>10} {'cociente':>9}", file=sys.stderr)
+    for r in results["results"]:
+        old = previous.get((r["case"], r["phase"]))
+        if old is None:
+            continue
+        ratio = r["min_s"] / old["min_s"] if old["min_s"] else float("inf")
+        flag = "  REGRESIÓN" if ratio > threshold else ""
+        if flag:
+            regressions.append((r["case"], r["phase"], ratio))
+        print(
+            f"{r['case']:<24} {r['phase']:<16} {old['min_s']:>10.5f} {r['min_s']:>10.5f} {ratio:>9.2f}{flag}",
+            file=sys.stderr,
+        )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="suite reducida")
+    parser.add_argument("--repeat", type=int, default=5, help="ejecuciones cronometradas por fase")
+    parser.add_argument("--filter", default="", help="solo casos cuyo nombre contiene este texto")
+    parser.add_argument("-o", "--output", help="fichero JSON de resultados (por defecto stdout)")
+    parser.add_argument("--baseline", help="JSON de una ejecución anterior con el que comparar")
+    parser.add_argument(
+        "--threshold", type=float, default=DEFAULT_THRESHOLD, help="cociente actual/base a partir del cual se falla"
+    )
+    args = parser.parse_args(argv)
+
+    axes, token_lengths = (QUICK_AXES, QUICK_TOKEN_LENGTHS) if args.quick else (AXES, TOKEN_LENGTHS)
+    scan_rules = QUICK_SCAN_RULES if args.quick else SCAN_RULES
+    records = []
+    for name, params in suite(axes):
+        if args.filter in name:
+            print(f"· {name}", file=sys.stderr)
+            records += run_case(name, params, token_lengths, args.repeat)
+    if args.filter in "cli":
+        print("· cli", file=sys.stderr)
+        records += run_cold_start(args.repeat)
+    if args.filter in "scan":
+        print("· scan", file=sys.stderr)
+        records += run_scan(scan_rules, args.repeat)
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "quick": args.quick,
+            "repeat": args.repeat,
+        },
+        "results": records,
+    }
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} fases más lentas que la referencia", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
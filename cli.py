@@ -0,0 +1,260 @@
+# cli.py
+"""
+Línea de comandos del simulador LL(1), sin Streamlit, pandas ni graphviz:
+
+    python cli.py analyze gramatica.txt          # FIRST y FOLLOW
+    python cli.py table gramatica.txt            # tabla LL(1)
+    python cli.py parse gramatica.txt entrada    # derivación de la entrada
+    python cli.py compile gramatica.txt -o g.ll1 # formato binario
+    python cli.py batch gramatica.txt corpus.txt # una entrada por línea, en paralelo
+    python cli.py bulk entregas.zip -o informe.jsonl  # muchas gramáticas, en paralelo
+
+Con "-" (o sin fichero de entrada en parse y batch) se lee de stdin. En
+analyze, table, parse y batch la gramática puede ser también un fichero de
+compile, que se abre con mmap sin volver a analizarla.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import ll1
+
+
+def read_text(path):
+    if path in (None, "-"):
+        return sys.stdin.read()
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def is_binary(path):
+    if path in (None, "-"):
+        return False
+    with open(path, "rb") as f:
+        return f.read(len(ll1.GRAMMAR_FILE_MAGIC)) == ll1.GRAMMAR_FILE_MAGIC
+
+
+def load_grammar(path, empty_sym, profile=ll1.NULL_PROFILE):
+    """Resultados con la forma de analyze_grammar_text (solo las claves que usa la CLI)."""
+    if is_binary(path):
+        grammar_file = ll1.load_grammar_binary(path)
+        compiled = grammar_file.compiled
+        table, terminals = grammar_file.parse_table()
+        return {
+            "first": grammar_file.first_sets(),
+            "follow": grammar_file.follow_sets(),
+            "table": table,
+            "terminals": terminals,
+            "start": compiled.symbols[compiled.start],
+            "compiled": compiled,
+        }
+    return ll1.analyze_grammar_text(read_text(path), empty_sym, profile)
+
+
+def cmd_analyze(args, results):
+    if args.json:
+        sets = {name: {A: sorted(s) for A, s in results[name].items()} for name in ("first", "follow")}
+        print(json.dumps({"start": results["start"], **sets}, indent=2, ensure_ascii=False))
+        return 0
+    for name in ("first", "follow"):
+        for A, s in results[name].items():
+            print(f"{name.upper()}({A}) = {{ {', '.join(sorted(s))} }}")
+    return 0
+
+
+def cmd_table(args, results):
+    table, terminals = results["table"], results["terminals"]
+    if args.json:
+        print(json.dumps(table, indent=2, ensure_ascii=False))
+        return 0
+    if args.long:
+        # Una línea por celda con producción: no-terminal, terminal, producción
+        for entry in ll1.table_entries(table, terminals):
+            print("\t".join(entry))
+        return 0
+    # Una fila por no-terminal, separada por tabuladores
+    print("\t".join([""] + terminals))
+    for A, row in table.items():
+        print("\t".join([A] + [" ".join(row[t]) if row[t] else "" for t in terminals]))
+    return 0
+
+
+def cmd_parse(args, results):
+    compiled = results["compiled"]
+    source = sys.stdin if args.input in (None, "-") else args.input
+    if args.lexer:
+        tokens = ll1.Lexer(results["terminals"]).tokenize_file(source)
+    else:
+        tokens = ll1.read_tokens(source)
+    if args.dot:
+        # El árbol necesita otra pasada sobre los mismos tokens
+        tokens = list(tokens)
+        tree = ll1.build_compact_tree(compiled, tokens)
+        ll1.write_tree_dot(tree, args.dot, compiled.empty_sym, max_depth=args.max_depth, max_nodes=args.max_nodes)
+    if args.all_errors:
+        # Recuperación en modo pánico: todos los errores en una pasada, sin derivación
+        errors = compiled.diagnose(tokens)
+        if args.json:
+            report = [
+                {"position": position, "message": message, "expected": list(expected)}
+                for position, message, expected in errors
+            ]
+            print(json.dumps({"accepted": not errors, "errors": report}, indent=2, ensure_ascii=False))
+        else:
+            for position, message, expected in errors:
+                print(f"{message} (token {position + 1})", file=sys.stderr)
+        return 1 if errors else 0
+    if args.trace:
+        accepted = True
+        for step in compiled.trace(tokens):
+            print("\t".join(step.values()))
+            accepted = step["Action"] == "Aceptado"
+        return 0 if accepted else 1
+    derivation, error = compiled.parse(tokens)
+    if args.json:
+        report = {
+            "accepted": error is None,
+            "derivation": [compiled.production_text(p) for p in derivation],
+            "error": None if error is None else {"position": error[0], "message": error[1]},
+        }
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        for p in derivation:
+            print(compiled.production_text(p))
+        if error is not None:
+            print(f"{error[1]} (token {error[0] + 1})", file=sys.stderr)
+    return 0 if error is None else 1
+
+
+def cmd_batch(args, results):
+    # Con un fichero binario cada proceso lo abre con mmap; si no, heredan la tabla
+    grammar = args.grammar if is_binary(args.grammar) else results["compiled"]
+    source = sys.stdin if args.corpus in (None, "-") else open(args.corpus, encoding="utf-8")
+    total = rejected = 0
+    start = time.perf_counter()
+    with source:
+        lines = (line.rstrip("\n") for line in source)
+        for index, accepted, position, expected in ll1.check_batch(
+            grammar, lines, args.workers, args.chunk_size, not args.unordered
+        ):
+            total += 1
+            rejected += not accepted
+            if args.json:
+                report = {"line": index + 1, "accepted": accepted, "position": position, "expected": list(expected)}
+                print(json.dumps(report, ensure_ascii=False))
+            elif accepted:
+                print(f"{index + 1}\tOK")
+            else:
+                print(f"{index + 1}\tERROR\t{position + 1}\t{' '.join(expected)}")
+    elapsed = time.perf_counter() - start
+    print(
+        f"{total} entradas, {total - rejected} aceptadas, {rejected} rechazadas "
+        f"en {elapsed:.2f} s ({total / elapsed if elapsed else 0:.0f} entradas/s)",
+        file=sys.stderr,
+    )
+    return 1 if rejected else 0
+
+
+def cmd_bulk(args, results):
+    output = sys.stdout if args.output in (None, "-") else open(args.output, "w", encoding="utf-8")
+    counts = {}
+    conflicting = 0
+    start = time.perf_counter()
+    with output:
+        sources = ll1.iter_grammar_sources(args.source)
+        for report in ll1.analyze_bulk(sources, args.empty, args.workers, args.timeout):
+            counts[report["status"]] = counts.get(report["status"], 0) + 1
+            conflicting += report.get("ll1") is False
+            output.write(json.dumps(report, ensure_ascii=False) + "\n")
+    elapsed = time.perf_counter() - start
+    summary = ", ".join(f"{n} {status}" for status, n in sorted(counts.items()))
+    print(
+        f"{sum(counts.values())} gramáticas ({summary or 'ninguna'}), {conflicting} con conflictos LL(1), "
+        f"en {elapsed:.2f} s",
+        file=sys.stderr,
+    )
+    return 1 if counts.get("error") or counts.get("timeout") else 0
+
+
+def cmd_compile(args, results):
+    ll1.save_grammar_binary(args.output, args.text, args.empty, results)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--empty", default="ε", help="símbolo de la cadena vacía (por defecto ε)")
+    parser.add_argument("--profile", action="store_true", help="mide cada fase y escribe el informe JSON en stderr")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    analyze = commands.add_parser("analyze", help="conjuntos FIRST y FOLLOW")
+    analyze.add_argument("grammar", nargs="?", default="-")
+    analyze.add_argument("--json", action="store_true")
+    analyze.set_defaults(run=cmd_analyze)
+
+    table = commands.add_parser("table", help="tabla LL(1)")
+    table.add_argument("grammar", nargs="?", default="-")
+    table.add_argument("--json", action="store_true")
+    table.add_argument("--long", action="store_true", help="solo las celdas con producción, una por línea")
+    table.set_defaults(run=cmd_table)
+
+    parse = commands.add_parser("parse", help="analiza una entrada; código de salida 1 si se rechaza")
+    parse.add_argument("grammar")
+    parse.add_argument("input", nargs="?", default="-", help="tokens separados por espacios (por defecto stdin)")
+    parse.add_argument("--lexer", action="store_true", help="tokeniza con el lexer de la gramática")
+    parse.add_argument("--trace", action="store_true", help="escribe la traza paso a paso (pila, entrada, acción)")
+    parse.add_argument("--json", action="store_true")
+    parse.add_argument("--all-errors", action="store_true", help="sigue tras cada error y los informa todos")
+    parse.add_argument(
+        "--dot", metavar="FICHERO", help="escribe el árbol de derivación en DOT (parcial si se rechaza)"
+    )
+    parse.add_argument("--max-depth", type=int, help="con --dot, colapsa los subárboles a esta profundidad")
+    parse.add_argument("--max-nodes", type=int, help="con --dot, máximo de nodos dibujados")
+    parse.set_defaults(run=cmd_parse)
+
+    batch = commands.add_parser("batch", help="comprueba un corpus (una entrada por línea) en paralelo")
+    batch.add_argument("grammar")
+    batch.add_argument("corpus", nargs="?", default="-")
+    batch.add_argument("--workers", type=int, help="procesos (por defecto, uno por CPU)")
+    batch.add_argument("--chunk-size", type=int, default=ll1.BATCH_CHUNK_SIZE, help="entradas por tarea")
+    batch.add_argument("--unordered", action="store_true", help="resultados según terminan, no en orden")
+    batch.add_argument("--json", action="store_true", help="un objeto JSON por línea")
+    batch.set_defaults(run=cmd_batch)
+
+    bulk = commands.add_parser("bulk", help="analiza un directorio o archivo (zip, tar) de gramáticas en paralelo")
+    bulk.add_argument("source")
+    bulk.add_argument("-o", "--output", help="informe JSON Lines (por defecto stdout)")
+    bulk.add_argument("--workers", type=int, help="procesos (por defecto, uno por CPU)")
+    bulk.add_argument("--timeout", type=float, default=ll1.BULK_TIMEOUT, help="segundos por gramática")
+    bulk.set_defaults(run=cmd_bulk)
+
+    compile_ = commands.add_parser("compile", help="guarda la gramática analizada en formato binario")
+    compile_.add_argument("grammar", nargs="?", default="-")
+    compile_.add_argument("-o", "--output", required=True)
+    compile_.set_defaults(run=cmd_compile)
+
+    args = parser.parse_args(argv)
+    profile = ll1.Profile() if args.profile else ll1.NULL_PROFILE
+    try:
+        if args.command == "compile":
+            # El texto se necesita también para la clave de la cabecera
+            args.text = read_text(args.grammar)
+            results = ll1.analyze_grammar_text(args.text, args.empty, profile)
+        elif args.command == "bulk":
+            # Cada gramática lleva sus tiempos en el informe
+            results = None
+        else:
+            results = load_grammar(args.grammar, args.empty, profile)
+        status = args.run(args, results)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    if args.profile:
+        print(profile.to_json(), file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,3068 @@
+# ll1.py
+# Núcleo del simulador LL(1): análisis de gramáticas, tablas, drivers y
+# árboles en Python puro, sin dependencias de interfaz. app.py (Streamlit)
+# y cli.py lo usan; graphviz solo se importa al dibujar un árbol.
+# multiprocessing, concurrent.futures, tarfile y zipfile también se importan
+# dentro de las funciones que los usan (check_batch, iter_grammar_sources,
+# analyze_bulk), para no cargarlos en el arranque de la CLI.
+
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import re
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from itertools import filterfalse, repeat
+
+
+# ——————————————————————————
+# 1. Scanner y parseo de la gramática
+# ——————————————————————————
+# Flecha, barra, palabras (letras, dígitos y _) y rachas de signos: "+",
+# "(", "<=" o ";" son terminales, y ε es un símbolo más
+GRAMMAR_TOKEN = re.compile(r"->|\||\w+|(?:(?!->)[^\s\w|])+")
+_grammar_patterns = {}
+
+
+def _grammar_pattern(empty_sym):
+    """GRAMMAR_TOKEN, salvo que el símbolo vacío no sea un token por sí solo (p. ej. "e'")."""
+    pattern = _grammar_patterns.get(empty_sym)
+    if pattern is None:
+        if GRAMMAR_TOKEN.fullmatch(empty_sym):
+            pattern = GRAMMAR_TOKEN
+        else:
+            pattern = re.compile(re.escape(empty_sym) + "|" + GRAMMAR_TOKEN.pattern)
+        pattern = _grammar_patterns[empty_sym] = pattern
+    return pattern
+
+
+def scan_grammar(text, empty_sym):
+    """
+    Tokeniza cada línea de la gramática en símbolos:
+    tokens: '->', '|', palabras y signos (el símbolo vacío es uno de ellos).
+    """
+    findall = _grammar_pattern(empty_sym).findall
+    return [tokens for tokens in map(findall, text.splitlines()) if tokens]
+
+
+def _grammar_error(message, pattern, line, lineno, token_index):
+    """ValueError con la línea y la columna (desde 1) del token token_index de line."""
+    match = next(m for k, m in enumerate(pattern.finditer(line)) if k == token_index)
+    return ValueError(f"{message} en la línea {lineno}, columna {match.start() + 1}")
+
+
+def parse_grammar_lines(lines, empty_sym):
+    """
+    Parsea la gramática de un iterable de líneas, sin cargar el texto entero.
+
+    - Un LHS repetido añade sus alternativas a las anteriores, en lugar de
+      reemplazarlas. Las alternativas repetidas se conservan: "s -> a | a"
+      es un conflicto LL(1) real y el análisis debe verlo.
+    - Los símbolos se internan y cada producción es una tupla, compartida
+      entre todas las reglas que la usan: las gramáticas generadas con
+      cientos de miles de reglas ocupan mucha menos memoria.
+    - Los errores indican línea y columna.
+
+    Lo habitual es que los símbolos vayan separados por espacios: entonces
+    basta con split() y con comprobar una vez cada símbolo nuevo, y la regex
+    solo recorre las líneas con símbolos pegados ("(expr)", "a|b").
+    """
+    pattern = _grammar_pattern(empty_sym)
+    match, findall = pattern.match, pattern.findall
+    intern = sys.intern
+    # Trozo entre espacios -> su versión internada, si es un único token
+    symbols = {"->": "->", "|": "|"}
+    known, get = symbols.__contains__, symbols.__getitem__
+    productions = {}
+    grammar = {}
+    for lineno, line in enumerate(lines, 1):
+        tokens = line.split()
+        if not all(map(known, tokens)):
+            for piece in filterfalse(known, tokens):
+                if not piece.isalnum():
+                    m = match(piece)
+                    if m is None or m.end() != len(piece):
+                        tokens = findall(line)
+                        for piece in filterfalse(known, tokens):
+                            symbols[piece] = intern(piece)
+                        break
+                symbols[piece] = intern(piece)
+        if not tokens:
+            continue
+        # tokens: [lhs, '->', sym1, sym2, '|', sym3, ...]
+        lhs = tokens[0]
+        # Validación de convención: LHS en minúscula
+        if not lhs.islower():
+            raise _grammar_error(f"El LHS `{lhs}` debe ser minúscula (no-terminal)", pattern, line, lineno, 0)
+        if len(tokens) < 2 or tokens[1] != "->":
+            raise _grammar_error(f"Se esperaba `->` tras `{lhs}`", pattern, line, lineno, min(1, len(tokens) - 1))
+        if "->" in tokens[2:]:
+            raise _grammar_error("`->` repetido", pattern, line, lineno, tokens.index("->", 2))
+        lhs = get(lhs)
+        prods = grammar.get(lhs)
+        if prods is None:
+            prods = grammar[lhs] = []
+        if "|" in tokens:
+            bars = [i for i, tok in enumerate(tokens) if tok == "|"]
+            bodies = [tokens[i + 1 : j] for i, j in zip([1] + bars, bars + [len(tokens)])]
+        else:
+            bodies = (tokens[2:],)
+        for body in bodies:
+            body = tuple(map(get, body))
+            prods.append(productions.setdefault(body, body))
+    return grammar
+
+
+def parse_grammar_with_scanner(text, empty_sym):
+    return parse_grammar_lines(text.splitlines(), empty_sym)
+
+
+def parse_grammar_file(source, empty_sym):
+    """Como parse_grammar_with_scanner, leyendo una ruta o flujo línea a línea."""
+    if isinstance(source, str):
+        with open(source, encoding="utf-8") as f:
+            return parse_grammar_lines(f, empty_sym)
+    return parse_grammar_lines(source, empty_sym)
+
+
+# ——————————————————————————
+# 2. Grafo de dependencias (SCC + propagación)
+# ——————————————————————————
+def _strongly_connected_components(nodes, edges):
+    """
+    Algoritmo de Tarjan en versión iterativa (sin límite de recursión).
+    Devuelve las componentes en orden topológico inverso: cada componente
+    aparece después de todas las componentes que alcanza.
+    """
+    index = {}
+    low = {}
+    on_stack = set()
+    stack = []
+    components = []
+    counter = 0
+    for root in nodes:
+        if root in index:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(edges.get(root, ())))]
+        while work:
+            v, successors = work[-1]
+            for w in successors:
+                if w not in index:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack.add(w)
+                    work.append((w, iter(edges.get(w, ()))))
+                    break
+                if w in on_stack and index[w] < low[v]:
+                    low[v] = index[w]
+            else:
+                work.pop()
+                if work:
+                    u = work[-1][0]
+                    if low[v] < low[u]:
+                        low[u] = low[v]
+                if low[v] == index[v]:
+                    component = []
+                    while True:
+                        w = stack.pop()
+                        on_stack.discard(w)
+                        component.append(w)
+                        if w == v:
+                            break
+                    components.append(component)
+    return components
+
+
+def _propagate(nodes, direct, edges, bitsets=False):
+    """
+    Resuelve X = direct[X] ∪ ⋃ Y (para cada arista X → Y) sobre el grafo
+    condensado: las componentes se procesan en orden topológico, de modo que
+    cada unión se hace una sola vez por arista entre componentes.
+    Con bitsets=True los conjuntos son enteros (máscaras de bits).
+    Devuelve (conjuntos, pasos de propagación = uniones realizadas).
+    """
+    comp_of = {}
+    comp_sets = []
+    steps = 0
+    for cid, component in enumerate(_strongly_connected_components(nodes, edges)):
+        for v in component:
+            comp_of[v] = cid
+        acc = 0 if bitsets else set()
+        seen = {cid}
+        for v in component:
+            acc |= direct[v]
+            steps += 1
+            for w in edges.get(v, ()):
+                wid = comp_of[w]
+                if wid not in seen:
+                    seen.add(wid)
+                    acc |= comp_sets[wid]
+                    steps += 1
+        comp_sets.append(acc)
+    if bitsets:
+        return {v: comp_sets[comp_of[v]] for v in nodes}, steps
+    return {v: set(comp_sets[comp_of[v]]) for v in nodes}, steps
+
+
+# ——————————————————————————
+# 3. Algoritmo FIRST
+# ——————————————————————————
+def compute_nullable(grammar, empty_sym, stats=None):
+    """
+    No-terminales anulables (los que tendrán ε en FIRST), con una lista de
+    trabajo y un contador de símbolos pendientes por producción.
+    """
+    nullable = set()
+    worklist = []
+    pending = []
+    users = {nt: [] for nt in grammar}
+    for A, prods in grammar.items():
+        for prod in prods:
+            prefix = []
+            for sym in prod:
+                if sym == empty_sym:
+                    break
+                if sym not in grammar:  # terminal: la producción nunca es anulable
+                    prefix = None
+                    break
+                prefix.append(sym)
+            if prefix is None:
+                continue
+            if not prefix:
+                if A not in nullable:
+                    nullable.add(A)
+                    worklist.append(A)
+                continue
+            pid = len(pending)
+            pending.append([A, len(prefix)])
+            for sym in prefix:
+                users[sym].append(pid)
+
+    steps = 0
+    while worklist:
+        X = worklist.pop()
+        for pid in users[X]:
+            steps += 1
+            entry = pending[pid]
+            entry[1] -= 1
+            if entry[1] == 0 and entry[0] not in nullable:
+                nullable.add(entry[0])
+                worklist.append(entry[0])
+
+    if stats is not None:
+        stats["nullable_steps"] = steps
+    return nullable
+
+
+def compute_first(grammar, empty_sym, stats=None):
+    nullable = compute_nullable(grammar, empty_sym, stats)
+    # FIRST(A) ⊇ terminales alcanzables y FIRST(X) de cada X alcanzable
+    direct = {nt: set() for nt in grammar}
+    edges = {nt: [] for nt in grammar}
+    for A, prods in grammar.items():
+        for prod in prods:
+            for sym in prod:
+                if sym == empty_sym:
+                    break
+                if sym not in grammar:  # terminal
+                    direct[A].add(sym)
+                    break
+                # no terminal
+                edges[A].append(sym)
+                if sym not in nullable:
+                    break
+
+    first, steps = _propagate(list(grammar), direct, edges)
+    for A in nullable:
+        first[A].add(empty_sym)
+
+    if stats is not None:
+        stats["first_steps"] = steps
+    return first
+
+
+# ——————————————————————————
+# 4. Algoritmo FOLLOW
+# ——————————————————————————
+def compute_follow(grammar, first, empty_sym, stats=None):
+    start = next(iter(grammar))
+    first_ne = {nt: first[nt] - {empty_sym} for nt in grammar}
+    # FOLLOW(B) ⊇ FIRST(beta) \ {ε}; FOLLOW(B) ⊇ FOLLOW(A) si beta es anulable
+    direct = {nt: set() for nt in grammar}
+    edges = {nt: [] for nt in grammar}
+    direct[start].add("$")
+    for A, prods in grammar.items():
+        for prod in prods:
+            # FIRST del sufijo prod[i+1:], recorriendo la producción de derecha a izquierda
+            suffix_first = set()
+            suffix_nullable = True
+            for i in range(len(prod) - 1, -1, -1):
+                B = prod[i]
+                if B in grammar:
+                    direct[B] |= suffix_first
+                    if suffix_nullable:
+                        edges[B].append(A)
+                if B == empty_sym:
+                    continue
+                if B not in grammar:
+                    suffix_first = {B}
+                    suffix_nullable = False
+                elif empty_sym in first[B]:
+                    suffix_first = first_ne[B] | suffix_first
+                else:
+                    suffix_first = first_ne[B]
+                    suffix_nullable = False
+
+    follow, steps = _propagate(list(grammar), direct, edges)
+
+    if stats is not None:
+        stats["follow_steps"] = steps
+    return follow
+
+
+# ——————————————————————————
+# 5. Construir tabla LL(1)
+# ——————————————————————————
+def compute_first_of_string(symbols, grammar, first, empty_sym):
+    result = set()
+    nullable = True
+    for sym in symbols:
+        if sym == empty_sym:
+            result.add(empty_sym)
+            break
+        if sym not in grammar:
+            result.add(sym)
+            nullable = False
+            break
+        result |= first[sym] - {empty_sym}
+        if empty_sym in first[sym]:
+            continue
+        else:
+            nullable = False
+            break
+    if nullable:
+        result.add(empty_sym)
+    return result
+
+
+def compute_parse_table(grammar, first, follow, empty_sym):
+    terminals = sorted(
+        {t for prods in grammar.values() for prod in prods for t in prod if t not in grammar and t != empty_sym}
+    )
+    terminals.append("$")
+    table = {A: compute_table_row(A, grammar, first, follow, empty_sym, terminals) for A in grammar}
+    return table, terminals
+
+
+def compute_table_row(A, grammar, first, follow, empty_sym, terminals):
+    row = {t: None for t in terminals}
+    for prod in grammar[A]:
+        first_alpha = compute_first_of_string(prod, grammar, first, empty_sym)
+        for t in first_alpha - {empty_sym}:
+            row[t] = prod
+        if empty_sym in first_alpha:
+            for t in follow[A]:
+                row[t] = prod
+    return row
+
+
+def table_entries(table, terminals):
+    """
+    La tabla en formato largo: (no-terminal, terminal, producción como texto)
+    solo para las celdas con producción, fila a fila y en el orden de
+    terminals. En tablas grandes casi todas las celdas están vacías.
+    """
+    return [
+        (A, t, " ".join(prod))
+        for A, row in table.items()
+        for t, prod in zip(terminals, map(row.get, terminals))
+        if prod
+    ]
+
+
+def find_conflicts(grammar, first, follow, empty_sym):
+    """
+    Celdas de la tabla que reclama más de una producción, es decir, por qué
+    la gramática no es LL(1): lista de (A, terminal, producciones) en el
+    orden de la gramática. compute_parse_table se queda con la última.
+    """
+    conflicts = []
+    for A, prods in grammar.items():
+        claims = {}
+        for prod in prods:
+            first_alpha = compute_first_of_string(prod, grammar, first, empty_sym)
+            lookaheads = first_alpha - {empty_sym}
+            if empty_sym in first_alpha:
+                lookaheads |= follow[A]
+            for t in lookaheads:
+                claims.setdefault(t, []).append(prod)
+        conflicts += [(A, t, claims[t]) for t in sorted(claims) if len(claims[t]) > 1]
+    return conflicts
+
+
+# ——————————————————————————
+# 6. Instrumentación por fases
+# ——————————————————————————
+class Profile:
+    """
+    Instrumentación opcional del pipeline. Cada fase (scan, first, follow,
+    table, compile, simulation, tree, dot...) guarda su tiempo de reloj y
+    las métricas que le añade quien la mide:
+
+        with profile.phase("first") as metrics:
+            ...
+            metrics["iterations"] = pasos
+
+    El diccionario de métricas sigue siendo el de la fase tras el with, así
+    que se le pueden añadir métricas calculadas fuera de la medida. Si una
+    fase se repite, la última medida sustituye a la anterior. Con "steps" se
+    informa también steps_per_s. Sin Profile se usa NULL_PROFILE, que no
+    mide nada; las métricas caras deben calcularse solo si enabled.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.phases = OrderedDict()
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def record(self, name, seconds, **metrics):
+        self.phases[name] = (seconds, metrics)
+
+    def to_dict(self):
+        phases = []
+        for name, (seconds, metrics) in self.phases.items():
+            entry = {"phase": name, "seconds": seconds, **metrics}
+            if metrics.get("steps") and seconds > 0:
+                entry["steps_per_s"] = metrics["steps"] / seconds
+            phases.append(entry)
+        return {"phases": phases, "total_seconds": sum(seconds for seconds, _ in self.phases.values())}
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2, ensure_ascii=False)
+
+
+class _Phase:
+    __slots__ = ("profile", "name", "metrics", "start")
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+        self.metrics = {}
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self.metrics
+
+    def __exit__(self, *exc):
+        self.profile.phases[self.name] = (time.perf_counter() - self.start, self.metrics)
+
+
+class _NullProfile:
+    enabled = False
+    # Diccionario de descarte para las métricas: nadie lo lee
+    _metrics = {}
+
+    def phase(self, name):
+        return self
+
+    def record(self, name, seconds, **metrics):
+        pass
+
+    def __enter__(self):
+        return self._metrics
+
+    def __exit__(self, *exc):
+        pass
+
+
+NULL_PROFILE = _NullProfile()
+
+
+# ——————————————————————————
+# 7. Análisis con conjuntos de bits
+# ——————————————————————————
+def _bit_positions(mask):
+    # Solo se visitan los bits a 1 (se aísla el más bajo y se quita), no los T bits de la máscara
+    positions = []
+    while mask:
+        low = mask & -mask
+        positions.append(low.bit_length() - 1)
+        mask ^= low
+    return positions
+
+
+def _bits_to_set(mask, symbols):
+    return {symbols[i] for i in _bit_positions(mask)}
+
+
+def _popcount(mask):
+    return bin(mask).count("1")
+
+
+class GrammarAnalysis:
+    """
+    Modo de análisis con conjuntos de bits: cada terminal se interna en una
+    posición de bit y cada conjunto FIRST/FOLLOW es un único entero.
+    FIRST de cada sufijo de producción se calcula una sola vez y lo
+    comparten FOLLOW y la construcción de la tabla. first_sets(),
+    follow_sets() y parse_table() devuelven las formas de siempre.
+    """
+
+    def __init__(self, grammar, empty_sym, stats=None, profile=NULL_PROFILE):
+        self.grammar = grammar
+        self.empty_sym = empty_sym
+        self.start = next(iter(grammar))
+        if stats is None and profile.enabled:
+            stats = {}
+        terminals = sorted(
+            {t for prods in grammar.values() for prod in prods for t in prod if t not in grammar and t != empty_sym}
+        )
+        terminals.append("$")
+        self.terminals = terminals
+        self.bit = {t: 1 << i for i, t in enumerate(terminals)}
+        # máscara -> posiciones de sus bits: FIRST de muchas producciones es el de su primer símbolo
+        self._positions = {}
+        self.productions = [(A, prod) for A, prods in grammar.items() for prod in prods]
+        with profile.phase("first") as metrics:
+            self.nullable = compute_nullable(grammar, empty_sym, stats)
+            self.first_mask = self._compute_first(stats)
+            self._compute_suffixes()
+        if profile.enabled:
+            metrics["iterations"] = stats["nullable_steps"] + stats["first_steps"]
+            metrics["insertions"] = sum(_popcount(mask) for mask in self.first_mask.values())
+        with profile.phase("follow") as metrics:
+            self.follow_mask = self._compute_follow(stats)
+        if profile.enabled:
+            metrics["iterations"] = stats["follow_steps"]
+            metrics["insertions"] = sum(_popcount(mask) for mask in self.follow_mask.values())
+
+    def _compute_first(self, stats):
+        grammar, empty_sym, nullable, bit = self.grammar, self.empty_sym, self.nullable, self.bit
+        direct = dict.fromkeys(grammar, 0)
+        edges = {nt: [] for nt in grammar}
+        for A, prod in self.productions:
+            for sym in prod:
+                if sym == empty_sym:
+                    break
+                if sym not in grammar:
+                    direct[A] |= bit[sym]
+                    break
+                edges[A].append(sym)
+                if sym not in nullable:
+                    break
+        first, steps = _propagate(list(grammar), direct, edges, bitsets=True)
+        if stats is not None:
+            stats["first_steps"] = steps
+        return first
+
+    def _compute_suffixes(self):
+        """
+        suffix_first[p][i] / suffix_nullable[p][i]: FIRST(prod[i:]) sin ε y si
+        el sufijo es anulable, para la producción p. production_first[p] y
+        production_nullable[p] son los de la producción completa.
+        """
+        grammar, empty_sym, nullable, bit, first = (
+            self.grammar,
+            self.empty_sym,
+            self.nullable,
+            self.bit,
+            self.first_mask,
+        )
+        self.suffix_first = []
+        self.suffix_nullable = []
+        self.production_first = []
+        self.production_nullable = []
+        for A, prod in self.productions:
+            n = len(prod)
+            masks = [0] * (n + 1)
+            nulls = [True] * (n + 1)
+            mask, null = 0, True
+            for i in range(n - 1, -1, -1):
+                sym = prod[i]
+                if sym == empty_sym:
+                    pass  # transparente dentro de beta, como en FOLLOW
+                elif sym not in grammar:
+                    mask, null = bit[sym], False
+                elif sym in nullable:
+                    mask |= first[sym]
+                else:
+                    mask, null = first[sym], False
+                masks[i] = mask
+                nulls[i] = null
+            self.suffix_first.append(masks)
+            self.suffix_nullable.append(nulls)
+            if empty_sym in prod and len(prod) > 1:
+                # ε en medio de la producción corta FIRST (ver compute_first_of_string)
+                mask = 0
+                for sym in prod:
+                    if sym == empty_sym:
+                        null = True
+                        break
+                    if sym not in grammar:
+                        mask |= bit[sym]
+                        null = False
+                        break
+                    mask |= first[sym]
+                    if sym not in nullable:
+                        null = False
+                        break
+                else:
+                    null = True
+                self.production_first.append(mask)
+                self.production_nullable.append(null)
+            else:
+                self.production_first.append(masks[0])
+                self.production_nullable.append(nulls[0])
+
+    def _compute_follow(self, stats):
+        grammar = self.grammar
+        direct = dict.fromkeys(grammar, 0)
+        edges = {nt: [] for nt in grammar}
+        direct[self.start] |= self.bit["$"]
+        for p, (A, prod) in enumerate(self.productions):
+            masks = self.suffix_first[p]
+            nulls = self.suffix_nullable[p]
+            for i, B in enumerate(prod):
+                if B in grammar:
+                    direct[B] |= masks[i + 1]
+                    if nulls[i + 1]:
+                        edges[B].append(A)
+        follow, steps = _propagate(list(grammar), direct, edges, bitsets=True)
+        if stats is not None:
+            stats["follow_steps"] = steps
+        return follow
+
+    def _bit_positions(self, mask):
+        positions = self._positions.get(mask)
+        if positions is None:
+            positions = self._positions[mask] = _bit_positions(mask)
+        return positions
+
+    def _sets(self, masks):
+        symbols = self.terminals.__getitem__
+        return {A: set(map(symbols, self._bit_positions(mask))) for A, mask in masks.items()}
+
+    def first_sets(self):
+        first = self._sets(self.first_mask)
+        for A in self.nullable:
+            first[A].add(self.empty_sym)
+        return first
+
+    def follow_sets(self):
+        return self._sets(self.follow_mask)
+
+    def parse_table(self):
+        """Misma salida que compute_parse_table: (tabla, terminales)."""
+        terminals = self.terminals
+        symbols = terminals.__getitem__
+        table = {A: dict.fromkeys(terminals) for A in self.grammar}
+        for p, (A, prod) in enumerate(self.productions):
+            mask = self.production_first[p]
+            if self.production_nullable[p]:
+                mask |= self.follow_mask[A]
+            # Asignación en C: una tupla (terminal, producción) por bit
+            table[A].update(zip(map(symbols, self._bit_positions(mask)), repeat(prod)))
+        return table, terminals
+
+
+# ——————————————————————————
+# 8. Análisis incremental
+# ——————————————————————————
+class IncrementalAnalysis:
+    """
+    Sesión de análisis que se actualiza con update(nueva_gramática): compara
+    con la gramática anterior, invalida solo los no-terminales cuyo FIRST o
+    FOLLOW puede cambiar según el grafo de dependencias, recalcula esa región
+    (el resto entra como constante) y parchea solo las filas y columnas
+    afectadas de la tabla.
+
+    first, follow, table y terminals tienen la forma de siempre. Cada update
+    crea diccionarios nuevos y solo reemplaza las entradas que cambian, así
+    que los resultados anteriores siguen siendo válidos (no se mutan).
+    """
+
+    def __init__(self, grammar, empty_sym):
+        self.empty_sym = empty_sym
+        self.grammar = {}
+        # Línea del texto -> {LHS: producciones}, para update_text
+        self.lines = {}
+        self.start = None
+        self.nullable = set()
+        self.first = {}
+        self.follow = {}
+        self.table = {}
+        self.terminals = ["$"]
+        self.terminal_set = set()
+        self.stats = {}
+        # símbolo -> {LHS: nº de apariciones en sus producciones}
+        self.occurrences = {}
+        # aristas FIRST A → B (A usa FIRST(B)) y FOLLOW B → A (B usa FOLLOW(A))
+        self.first_edges = {}
+        self.first_users = {}
+        self.follow_edges = {}
+        self.follow_users = {}
+        self.update(grammar)
+
+    def _count_occurrences(self, A, prods, delta):
+        for prod in prods:
+            for sym in prod:
+                users = self.occurrences.setdefault(sym, {})
+                users[A] = users.get(A, 0) + delta
+                if not users[A]:
+                    del users[A]
+
+    @staticmethod
+    def _set_edges(edges, users, node, targets):
+        for target in edges.pop(node, ()):
+            users[target].discard(node)
+        if targets is not None:
+            edges[node] = targets
+            for target in targets:
+                users.setdefault(target, set()).add(node)
+
+    @staticmethod
+    def _closure(seeds, users, nodes):
+        region = {A for A in seeds if A in nodes}
+        pending = list(region)
+        while pending:
+            for U in users.get(pending.pop(), ()):
+                if U not in region and U in nodes:
+                    region.add(U)
+                    pending.append(U)
+        return region
+
+    def update_text(self, text):
+        """
+        update() a partir del texto de la gramática. Solo se parsean las
+        líneas que no estaban en el texto anterior; las demás reutilizan sus
+        producciones. Si una línea nueva es errónea se vuelve a parsear el
+        texto entero para que el error lleve su número de línea.
+        """
+        previous, lines = self.lines, {}
+        grammar = {}
+        try:
+            for line in text.splitlines():
+                rule = lines.get(line)
+                if rule is None:
+                    rule = previous.get(line)
+                    if rule is None:
+                        rule = parse_grammar_lines((line,), self.empty_sym)
+                    lines[line] = rule
+                for lhs, prods in rule.items():
+                    grammar.setdefault(lhs, []).extend(prods)
+        except ValueError:
+            parse_grammar_lines(text.splitlines(), self.empty_sym)
+            raise
+        self.lines = lines
+        return self.update(grammar)
+
+    def update(self, grammar):
+        """Re-analiza respecto a la gramática anterior; devuelve los no-terminales cambiados."""
+        old = self.grammar
+        changed = {A for A in grammar if old.get(A) != grammar[A]} | (old.keys() - grammar.keys())
+        # Un símbolo que pasa a ser (o deja de ser) no-terminal cambia a quien lo usa
+        for name in old.keys() ^ grammar.keys():
+            changed.update(self.occurrences.get(name, ()))
+        old_start, start = self.start, next(iter(grammar), None)
+        stats = {"changed": len(changed)}
+        self.stats = stats
+        if not changed and old_start == start:
+            stats.update(
+                nullable_steps=0,
+                first_steps=0,
+                follow_steps=0,
+                first_region=0,
+                follow_region=0,
+                follow_recomputed=0,
+                rows=0,
+            )
+            # Puede haber cambiado solo el orden de las reglas
+            self.grammar = grammar
+            self._reorder()
+            return changed
+
+        # Símbolos de las producciones viejas y nuevas de lo cambiado
+        touched = old.keys() ^ grammar.keys()
+        for A in changed:
+            for prods in (old.get(A, ()), grammar.get(A, ())):
+                for prod in prods:
+                    touched.update(prod)
+            self._count_occurrences(A, old.get(A, ()), -1)
+            self._count_occurrences(A, grammar.get(A, ()), +1)
+        self.grammar = grammar
+        self.start = start
+        removed = old.keys() - grammar.keys()
+        for A in removed:
+            self._set_edges(self.first_edges, self.first_users, A, None)
+            self._set_edges(self.follow_edges, self.follow_users, A, None)
+        follow_seeds = touched | {start, old_start}
+
+        # Nulabilidad y FIRST: todo lo que depende (vía aristas FIRST) de lo cambiado
+        region = self._closure(changed, self.first_users, grammar)
+        old_nullable = {A for A in region if A in self.nullable}
+        old_first = {A: self.first.get(A) for A in region}
+        self._update_first(region, removed, stats)
+        first_changed = {
+            A for A in region if self.first[A] != old_first[A] or (A in self.nullable) != (A in old_nullable)
+        }
+        for X in first_changed:
+            for A in self.occurrences.get(X, ()):
+                for prod in grammar[A]:
+                    follow_seeds.update(prod)
+
+        # FOLLOW: lo sembrado y todo lo que hereda FOLLOW de ello
+        follow_region = self._closure(follow_seeds, self.follow_users, grammar)
+        follow_changed = self._update_follow(follow_region, follow_seeds, removed, stats)
+
+        # Filas: lo cambiado, lo que usa un FIRST cambiado y los FOLLOW cambiados
+        rows = changed | first_changed | follow_changed
+        for X in first_changed:
+            rows.update(self.first_users.get(X, ()))
+        self._update_table(rows, touched, removed, stats)
+        self._reorder()
+        stats["first_region"] = len(region)
+        stats["follow_region"] = len(follow_region)
+        return changed
+
+    def _reorder(self):
+        """
+        first, follow y table en el orden de la gramática, como en un análisis
+        completo: los no-terminales recalculados se añadieron al final, y la
+        tabla (filas de la interfaz, ids de CompiledTable) sigue ese orden.
+        """
+        order = list(self.grammar)
+        if list(self.first) != order:
+            self.first = {A: self.first[A] for A in order}
+        if list(self.follow) != order:
+            self.follow = {A: self.follow[A] for A in order}
+        if list(self.table) != order:
+            self.table = {A: self.table[A] for A in order}
+
+    def _update_first(self, region, removed, stats):
+        grammar, empty_sym = self.grammar, self.empty_sym
+        nullable = self.nullable - region - removed
+        first = dict(self.first)
+        for A in removed:
+            del first[A]
+
+        # Anulables dentro de la región; fuera de ella se conocen
+        worklist = []
+        pending = []
+        users = {A: [] for A in region}
+        for A in region:
+            for prod in grammar[A]:
+                prefix = []
+                for sym in prod:
+                    if sym == empty_sym:
+                        break
+                    if sym not in grammar or (sym not in region and sym not in nullable):
+                        prefix = None
+                        break
+                    if sym in region:
+                        prefix.append(sym)
+                if prefix is None:
+                    continue
+                if not prefix:
+                    if A not in nullable:
+                        nullable.add(A)
+                        worklist.append(A)
+                    continue
+                pending.append([A, len(prefix)])
+                for sym in prefix:
+                    users[sym].append(len(pending) - 1)
+        steps = 0
+        while worklist:
+            for pid in users[worklist.pop()]:
+                steps += 1
+                entry = pending[pid]
+                entry[1] -= 1
+                if entry[1] == 0 and entry[0] not in nullable:
+                    nullable.add(entry[0])
+                    worklist.append(entry[0])
+        stats["nullable_steps"] = steps
+
+        direct = {A: set() for A in region}
+        edges = {A: [] for A in region}
+        for A in region:
+            targets = set()
+            for prod in grammar[A]:
+                for sym in prod:
+                    if sym == empty_sym:
+                        break
+                    if sym not in grammar:
+                        direct[A].add(sym)
+                        break
+                    targets.add(sym)
+                    if sym in region:
+                        edges[A].append(sym)
+                    else:
+                        direct[A] |= first[sym] - {empty_sym}
+                    if sym not in nullable:
+                        break
+            self._set_edges(self.first_edges, self.first_users, A, targets)
+        region_first, stats["first_steps"] = _propagate(list(region), direct, edges)
+        for A in region:
+            if A in nullable:
+                region_first[A].add(empty_sym)
+        first.update(region_first)
+        self.nullable = nullable
+        self.first = first
+
+    def _follow_inputs(self, B):
+        """(terminales que B recibe directamente, LHS de los que hereda FOLLOW)."""
+        grammar, empty_sym, first = self.grammar, self.empty_sym, self.first
+        direct = {"$"} if B == self.start else set()
+        targets = set()
+        for A in self.occurrences.get(B, ()):
+            for prod in grammar[A]:
+                if B not in prod:
+                    continue
+                suffix_first = set()
+                suffix_nullable = True
+                for i in range(len(prod) - 1, -1, -1):
+                    sym = prod[i]
+                    if sym == B:
+                        direct |= suffix_first
+                        if suffix_nullable:
+                            targets.add(A)
+                    if sym == empty_sym:
+                        continue
+                    if sym not in grammar:
+                        suffix_first = {sym}
+                        suffix_nullable = False
+                    elif empty_sym in first[sym]:
+                        suffix_first = (first[sym] - {empty_sym}) | suffix_first
+                    else:
+                        suffix_first = first[sym] - {empty_sym}
+                        suffix_nullable = False
+        return direct, targets
+
+    def _update_follow(self, region, seeds, removed, stats):
+        """
+        Recalcula FOLLOW en la región componente a componente, en orden
+        topológico. Una componente sin semillas cuyas dependencias no han
+        cambiado conserva su valor sin volver a recorrer sus producciones.
+        """
+        follow = dict(self.follow)
+        for B in removed:
+            del follow[B]
+        inputs = {}
+        for B in region:
+            if B in seeds:
+                inputs[B] = self._follow_inputs(B)
+                self._set_edges(self.follow_edges, self.follow_users, B, inputs[B][1])
+        edges = {B: [A for A in self.follow_edges.get(B, ()) if A in region] for B in region}
+        changed = set()
+        steps = 0
+        recomputed = 0
+        for component in _strongly_connected_components(list(region), edges):
+            if not any(B in seeds or any(A in changed for A in edges[B]) for B in component):
+                continue
+            members = set(component)
+            acc = set()
+            for B in component:
+                if B not in inputs:
+                    inputs[B] = self._follow_inputs(B)
+                acc |= inputs[B][0]
+                for A in self.follow_edges[B]:
+                    if A not in members:
+                        acc |= follow[A]
+                        steps += 1
+            for B in component:
+                if follow.get(B) != acc:
+                    changed.add(B)
+                follow[B] = set(acc)
+            recomputed += len(component)
+        stats["follow_steps"] = steps
+        stats["follow_recomputed"] = recomputed
+        self.follow = follow
+        return changed
+
+    def _update_table(self, rows, touched, removed, stats):
+        grammar, empty_sym = self.grammar, self.empty_sym
+        table = dict(self.table)
+        for A in removed:
+            del table[A]
+        # Solo los símbolos tocados pueden entrar o salir del conjunto de terminales
+        terminal_set = set(self.terminal_set)
+        for sym in touched:
+            if sym not in grammar and sym != empty_sym and self.occurrences.get(sym):
+                terminal_set.add(sym)
+            else:
+                terminal_set.discard(sym)
+        if terminal_set != self.terminal_set:
+            # Columnas nuevas o eliminadas: se reescriben todas las filas
+            terminals = sorted(terminal_set)
+            terminals.append("$")
+            for A, row in table.items():
+                table[A] = dict(zip(terminals, map(row.get, terminals)))
+            self.terminals = terminals
+            self.terminal_set = terminal_set
+        rows = {A for A in rows if A in grammar}
+        for A in rows:
+            table[A] = compute_table_row(A, grammar, self.first, self.follow, empty_sym, self.terminals)
+        self.table = table
+        stats["rows"] = len(rows)
+
+    def results(self):
+        """Resultados con la misma forma que analyze_grammar_text; compiled y lexer se construyen al pedirlos."""
+        return _LazyResults(
+            self.empty_sym,
+            grammar=self.grammar,
+            first=self.first,
+            follow=self.follow,
+            table=self.table,
+            terminals=self.terminals,
+            start=self.start,
+            stats=self.stats,
+        )
+
+
+class _LazyResults(dict):
+    """
+    Diccionario de resultados en el que "compiled" y "lexer" se construyen
+    la primera vez que se piden y quedan guardados: cuestan O(N·T) y la
+    mayoría de las ediciones no llegan a simular ninguna entrada.
+    """
+
+    def __init__(self, empty_sym, **results):
+        super().__init__(results)
+        self.empty_sym = empty_sym
+
+    def __missing__(self, key):
+        if key == "compiled":
+            value = CompiledTable(self["grammar"], self["table"], self["terminals"], self.empty_sym)
+        elif key == "lexer":
+            value = Lexer(self["terminals"])
+        else:
+            raise KeyError(key)
+        self[key] = value
+        return value
+
+
+# ——————————————————————————
+# 9. Tabla LL(1) compilada (índices enteros)
+# ——————————————————————————
+# Por debajo de esta proporción de celdas llenas se usa el formato CSR
+SPARSE_FILL_RATIO = 0.1
+# Valor de celda: expandir ese no-terminal con ese lookahead no termina nunca
+LOOPING_CELL = -2
+# Terminales que diagnose debe emparejar tras un error antes de informar de otro
+# (yacc usa 3; con entradas cortas escritas a mano callaría errores reales)
+RECOVERY_MATCHES = 1
+
+
+class CompiledTable:
+    """
+    Tabla LL(1) con no-terminales, terminales y producciones internados como
+    enteros pequeños. Los no-terminales ocupan los ids 0..N-1 y los terminales
+    (incluido "$") los ids N..N+T-1; cada producción es una tupla de ids sin ε.
+    Las celdas guardan el id de producción (-1 = error) en un array denso
+    fila-mayor o, si la tabla está casi vacía, en formato CSR.
+    """
+
+    def __init__(self, grammar, table, terminals, empty_sym, layout="auto", start=None):
+        self._intern(list(grammar), list(dict.fromkeys(terminals)), empty_sym)
+        N, T = self.n_nonterminals, self.n_terminals
+        self.start = 0 if start is None else self.symbol_id[start]
+
+        self.productions = []
+        self.production_lhs = []
+        production_id = {}
+        for A, prods in grammar.items():
+            for prod in prods:
+                key = (A, tuple(prod))
+                if key in production_id:
+                    continue
+                production_id[key] = len(self.productions)
+                self.production_lhs.append(self.symbol_id[A])
+                self.productions.append(tuple(self.symbol_id[s] for s in prod if s != empty_sym))
+        # Cuerpos invertidos, listos para apilar
+        self.reversed_productions = [body[::-1] for body in self.productions]
+
+        cells = []
+        for A in self.nonterminals:
+            row = table[A]
+            for t in self.terminals:
+                prod = row.get(t)
+                if prod:
+                    cells.append((self.symbol_id[A], self.symbol_id[t] - N, production_id[(A, tuple(prod))]))
+        self.filled = len(cells)
+        self.fill_ratio = self.filled / (N * T) if N * T else 0.0
+        if layout == "auto":
+            layout = "csr" if self.fill_ratio < SPARSE_FILL_RATIO else "dense"
+        self.layout = layout
+
+        if layout == "dense":
+            self.cells = array("i", [-1]) * (N * T)
+            for a, t, p in cells:
+                self.cells[a * T + t] = p
+        elif layout == "csr":
+            # cells ya está ordenado por (fila, columna)
+            self.row_ptr = array("i", [0]) * (N + 1)
+            for a, _, _ in cells:
+                self.row_ptr[a + 1] += 1
+            for a in range(N):
+                self.row_ptr[a + 1] += self.row_ptr[a]
+            self.col_idx = array("i", [t for _, t, _ in cells])
+            self.values = array("i", [p for _, _, p in cells])
+        else:
+            raise ValueError(f"Formato de tabla desconocido: `{layout}`")
+
+        if self._has_left_recursion():
+            self._mark_looping_cells()
+
+    def _intern(self, nonterminals, terminals, empty_sym):
+        self.empty_sym = empty_sym
+        self.nonterminals = nonterminals
+        self.terminals = terminals
+        self.symbols = self.nonterminals + self.terminals
+        self.symbol_id = {s: i for i, s in enumerate(self.symbols)}
+        self.terminal_id = {t: self.symbol_id[t] for t in self.terminals}
+        self.n_nonterminals = len(self.nonterminals)
+        self.n_terminals = len(self.terminals)
+        self.end = self.symbol_id["$"]
+
+    def lookup(self, nonterminal, terminal):
+        """Id de producción para (id de no-terminal, id de terminal); negativo si no hay."""
+        t = terminal - self.n_nonterminals
+        if self.layout == "dense":
+            return self.cells[nonterminal * self.n_terminals + t]
+        lo, hi = self.row_ptr[nonterminal], self.row_ptr[nonterminal + 1]
+        k = bisect_left(self.col_idx, t, lo, hi)
+        if k < hi and self.col_idx[k] == t:
+            return self.values[k]
+        return -1
+
+    def _set_cell(self, nonterminal, terminal, value):
+        t = terminal - self.n_nonterminals
+        if self.layout == "dense":
+            self.cells[nonterminal * self.n_terminals + t] = value
+        else:
+            lo, hi = self.row_ptr[nonterminal], self.row_ptr[nonterminal + 1]
+            self.values[bisect_left(self.col_idx, t, lo, hi)] = value
+
+    def _cell_map(self):
+        """
+        Celdas con valor (incluidas las LOOPING_CELL) como
+        ({fila * ancho + lookahead: producción}.get, ancho), para los drivers:
+        una sola consulta en C, igual para tabla densa o CSR. Con ancho N+T+1,
+        un lookahead -1 (token que no es terminal de la gramática) nunca
+        coincide con una clave y la consulta da el valor por defecto -1.
+        Se construye la primera vez y ocupa del orden de las celdas llenas.
+        """
+        cell_map = getattr(self, "_cells_by_key", None)
+        if cell_map is None:
+            N, T = self.n_nonterminals, self.n_terminals
+            width = N + T + 1
+            cell_map = {}
+            if self.layout == "dense":
+                for k, p in enumerate(self.cells):
+                    if p != -1:
+                        a, t = divmod(k, T)
+                        cell_map[a * width + N + t] = p
+            else:
+                row_ptr, col_idx, values = self.row_ptr, self.col_idx, self.values
+                for a in range(N):
+                    base = a * width + N
+                    for k in range(row_ptr[a], row_ptr[a + 1]):
+                        cell_map[base + col_idx[k]] = values[k]
+            self._cells_by_key = cell_map
+        return cell_map.get, self.n_nonterminals + self.n_terminals + 1
+
+    def _driver_start(self, tokens):
+        """
+        Estado inicial de los drivers: (iterador, primer token, pila). tokens
+        puede ser cualquier iterable: solo se lee por adelantado el token de
+        lookahead.
+        """
+        tokens = iter(tokens)
+        return tokens, next(tokens, "$"), [self.end, self.start]
+
+    def _has_left_recursion(self):
+        N = self.n_nonterminals
+        body_grammar = {A: [] for A in self.nonterminals}
+        for a, body in zip(self.production_lhs, self.productions):
+            body_grammar[self.symbols[a]].append([self.symbols[s] for s in body])
+        nullable = {self.symbol_id[A] for A in compute_nullable(body_grammar, self.empty_sym)}
+        edges = {a: [] for a in range(N)}
+        for a, body in zip(self.production_lhs, self.productions):
+            for s in body:
+                if s >= N:
+                    break
+                edges[a].append(s)
+                if s not in nullable:
+                    break
+        for component in _strongly_connected_components(range(N), edges):
+            if len(component) > 1 or component[0] in edges[component[0]]:
+                return True
+        return False
+
+    def _mark_looping_cells(self):
+        """
+        Con recursión izquierda, expandir A con lookahead t puede repetirse
+        sin consumir nunca la entrada. Para cada t se sigue, sin recursión de
+        Python, qué hace cada A: se detiene en un terminal, se borra (deriva ε)
+        o vuelve a sí mismo; las celdas del último caso se marcan LOOPING_CELL.
+        """
+        N = self.n_nonterminals
+        in_progress, stops, erases, loops = range(4)
+        for t in range(N, N + self.n_terminals):
+            state = {}
+            for root in range(N):
+                p = self.lookup(root, t)
+                if root in state or p < 0:
+                    continue
+                state[root] = in_progress
+                work = [[root, self.productions[p], 0]]
+                while work:
+                    frame = work[-1]
+                    A, body, k = frame
+                    result = erases
+                    descended = False
+                    while k < len(body):
+                        s = body[k]
+                        if s >= N:
+                            result = stops
+                            break
+                        s_state = state.get(s)
+                        if s_state is None:
+                            q = self.lookup(s, t)
+                            if q < 0:
+                                state[s] = stops
+                                result = stops
+                                break
+                            state[s] = in_progress
+                            frame[2] = k
+                            work.append([s, self.productions[q], 0])
+                            descended = True
+                            break
+                        if s_state == in_progress or s_state == loops:
+                            result = loops
+                            break
+                        if s_state == stops:
+                            result = stops
+                            break
+                        k += 1
+                    if not descended:
+                        state[A] = result
+                        work.pop()
+            for A, A_state in state.items():
+                if A_state == loops:
+                    self._set_cell(A, t, LOOPING_CELL)
+
+    def error_message(self, top, p, current):
+        if top >= self.n_nonterminals:
+            return f"Error: expected {self.symbols[top]}, got {current}"
+        if p == LOOPING_CELL:
+            return f"Error: recursión izquierda en {self.symbols[top]} con {current}"
+        return f"Error: no regla para {self.symbols[top]} con {current}"
+
+    def production_text(self, p):
+        body = self.productions[p]
+        rhs = " ".join(self.symbols[s] for s in body) if body else self.empty_sym
+        return f"{self.symbols[self.production_lhs[p]]} → {rhs}"
+
+    def parse(self, tokens):
+        """
+        Driver LL(1) sobre la tabla compilada; tokens puede ser cualquier
+        iterable (lista, generador, read_tokens...). Devuelve (derivación, error):
+        la lista de ids de producción aplicados (derivación más a la izquierda)
+        y None si la entrada se acepta, o (posición, mensaje) en caso de error.
+        """
+        N, end = self.n_nonterminals, self.end
+        cell, width = self._cell_map()
+        reversed_productions = self.reversed_productions
+        terminal_id = self.terminal_id
+        tokens, current, stack = self._driver_start(tokens)
+        derivation = []
+        i = 0
+        lookahead = terminal_id.get(current, -1)
+        while True:
+            top = stack.pop()
+            if top < N:
+                p = cell(top * width + lookahead, -1)
+                if p < 0:
+                    return derivation, (i, self.error_message(top, p, current))
+                derivation.append(p)
+                stack.extend(reversed_productions[p])
+            elif top == lookahead:
+                if top == end:
+                    return derivation, None
+                i += 1
+                current = next(tokens, "$")
+                lookahead = terminal_id.get(current, -1)
+            else:
+                return derivation, (i, self.error_message(top, -1, current))
+
+    def recognize(self, tokens):
+        """
+        Solo aceptar/rechazar, sin traza ni derivación y sin límite de pasos.
+        Acepta cualquier iterable de tokens y usa memoria constante respecto
+        a la longitud de la entrada (solo crece con la profundidad de la pila).
+        Devuelve (True, None) o (False, posición del token con el error).
+        """
+        position, top = self._recognize(tokens)
+        return (True, None) if top < 0 else (False, position)
+
+    def check(self, tokens):
+        """
+        Como recognize, pero con los terminales que se esperaban en el error:
+        (True, None, ()) o (False, posición, terminales esperados).
+        """
+        position, top = self._recognize(tokens)
+        return (True, None, ()) if top < 0 else (False, position, self.expected(top))
+
+    def expected(self, top):
+        """Terminales válidos como lookahead con top en la cima de la pila."""
+        N = self.n_nonterminals
+        if top >= N:
+            return (self.symbols[top],)
+        return tuple(self.symbols[t] for t in range(N, N + self.n_terminals) if self.lookup(top, t) >= 0)
+
+    def _recognize(self, tokens):
+        """(posición, cima de la pila) donde falla el driver; cima -1 si acepta."""
+        N, end = self.n_nonterminals, self.end
+        cell, width = self._cell_map()
+        reversed_productions = self.reversed_productions
+        terminal_id = self.terminal_id
+        tokens, current, stack = self._driver_start(tokens)
+        pop, extend = stack.pop, stack.extend
+        i = 0
+        lookahead = terminal_id.get(current, -1)
+        while True:
+            top = pop()
+            if top < N:
+                p = cell(top * width + lookahead, -1)
+                if p < 0:
+                    return i, top
+                extend(reversed_productions[p])
+            elif top == lookahead:
+                if top == end:
+                    return i, -1
+                i += 1
+                current = next(tokens, "$")
+                lookahead = terminal_id.get(current, -1)
+            else:
+                return i, top
+
+    def sync_sets(self):
+        """
+        Conjuntos de sincronización del modo pánico: por no-terminal, el
+        frozenset de ids de FOLLOW(A). FIRST(A) no hace falta guardarlo: son
+        las celdas definidas de la fila de A. Se calculan una vez, a partir
+        de las producciones internadas, y quedan en la tabla.
+        """
+        sync = getattr(self, "_sync", None)
+        if sync is None:
+            names = self.symbols
+            order = [self.start] + [a for a in range(self.n_nonterminals) if a != self.start]
+            grammar = {names[a]: [] for a in order}
+            for a, body in zip(self.production_lhs, self.productions):
+                grammar[names[a]].append([names[s] for s in body] or [self.empty_sym])
+            follow = compute_follow(grammar, compute_first(grammar, self.empty_sym), self.empty_sym)
+            sync = self._sync = [frozenset(self.symbol_id[t] for t in follow[A]) for A in self.nonterminals]
+        return sync
+
+    def diagnose(self, tokens, max_errors=None):
+        """
+        Driver con recuperación en modo pánico: una sola pasada que devuelve
+        todos los errores como (posición, mensaje, terminales esperados), o
+        una lista vacía si la entrada se acepta.
+
+        - Sin regla para (A, a): si a está en FOLLOW(A) o es $, se desapila
+          A como si hubiera derivado lo que falta; si no, se descarta a y se
+          vuelve a probar A (así se llega a FIRST(A) o a FOLLOW(A)).
+        - Terminal en la cima distinto de a: se desapila, como si se hubiera
+          insertado; un token que no es terminal de la gramática se descarta.
+        - Tras un error no se informa de otro hasta emparejar
+          RECOVERY_MATCHES terminales, para no encadenar errores en cascada.
+
+        Cada paso de recuperación consume un token o desapila un símbolo,
+        así que el coste sigue siendo lineal. Si la tabla tiene conflictos
+        las expansiones podrían repetirse sin avanzar: tras un error cada
+        token dispone de un presupuesto fijo de 2(N+1) expansiones, que no
+        depende de la pila, y al agotarlo se descarta el token (o, en $, se
+        vacía la pila sin expandir). El trabajo total queda acotado por
+        O(longitud de la entrada × N). Las entradas correctas siguen el
+        mismo bucle que _recognize.
+        """
+        N, end = self.n_nonterminals, self.end
+        cell, width = self._cell_map()
+        reversed_productions = self.reversed_productions
+        terminal_id = self.terminal_id
+        sync = self.sync_sets()
+        errors = []
+        # Cada símbolo en la cima recorre una vez los terminales para expected
+        expected = {}
+        # Emparejamientos que faltan para volver a informar (0: se informa)
+        quiet = 0
+        # Expansiones en recuperación sin consumir entrada, y su máximo por token
+        stall = 0
+        stall_limit = 2 * (N + 1)
+        tokens, current, stack = self._driver_start(tokens)
+        pop, push, extend = stack.pop, stack.append, stack.extend
+        i = 0
+        lookahead = terminal_id.get(current, -1)
+        while True:
+            top = pop()
+            if top < N:
+                p = cell(top * width + lookahead, -1)
+                if p >= 0:
+                    if not quiet:
+                        extend(reversed_productions[p])
+                        continue
+                    stall += 1
+                    if stall <= stall_limit:
+                        extend(reversed_productions[p])
+                        continue
+                    # Solo con conflictos en la tabla: la recuperación no avanza y se fuerza.
+                    # Al final de la entrada ya no se expande nada y la pila solo se vacía.
+                    if lookahead == end:
+                        continue
+                    push(top)
+                else:
+                    if not quiet:
+                        if top not in expected:
+                            expected[top] = self.expected(top)
+                        errors.append((i, self.error_message(top, p, current), expected[top]))
+                        quiet = RECOVERY_MATCHES
+                        if len(errors) == max_errors:
+                            return errors
+                    if lookahead == end or lookahead in sync[top] or p == LOOPING_CELL:
+                        continue
+                    push(top)
+            elif top == lookahead:
+                if top == end:
+                    return errors
+                if quiet:
+                    quiet -= 1
+            else:
+                if not quiet:
+                    if top not in expected:
+                        expected[top] = self.expected(top)
+                    errors.append((i, self.error_message(top, -1, current), expected[top]))
+                    quiet = RECOVERY_MATCHES
+                    if len(errors) == max_errors:
+                        return errors
+                if lookahead >= 0 and top != end:
+                    continue
+                # Token desconocido, o entrada de sobra tras completar el símbolo inicial
+                push(top)
+            i += 1
+            stall = 0
+            current = next(tokens, "$")
+            lookahead = terminal_id.get(current, -1)
+
+    def events(self, tokens):
+        """
+        Driver basado en eventos, sobre cualquier iterable de tokens.
+        Genera tuplas (tipo, símbolo, producción, posición, token):
+        (EXPAND, A, p, i, tok), (MATCH, t, -1, i, tok), (ACCEPT, $, -1, i, "$")
+        o (ERROR, tope, código, i, tok), donde tok es el token de lookahead y
+        el código es el valor de la celda (-1 o LOOPING_CELL), o -1 si el tope
+        es un terminal.
+        """
+        N, end = self.n_nonterminals, self.end
+        cell, width = self._cell_map()
+        reversed_productions = self.reversed_productions
+        terminal_id = self.terminal_id
+        tokens, current, stack = self._driver_start(tokens)
+        i = 0
+        lookahead = terminal_id.get(current, -1)
+        while True:
+            top = stack.pop()
+            if top < N:
+                p = cell(top * width + lookahead, -1)
+                if p < 0:
+                    yield ERROR, top, p, i, current
+                    return
+                yield EXPAND, top, p, i, current
+                stack.extend(reversed_productions[p])
+            elif top == lookahead:
+                if top == end:
+                    yield ACCEPT, top, -1, i, current
+                    return
+                yield MATCH, top, -1, i, current
+                i += 1
+                current = next(tokens, "$")
+                lookahead = terminal_id.get(current, -1)
+            else:
+                yield ERROR, top, -1, i, current
+                return
+
+    def trace(self, tokens):
+        """
+        Generador de la traza: produce un paso {"Stack", "Input", "Action"}
+        cada vez, sin límite de pasos. Las cadenas de pila y entrada solo se
+        construyen para los pasos que el llamador realmente consume.
+        """
+        tokens = list(tokens)
+        recorder = TraceRecorder(self, tokens)
+        for event in self.events(tokens):
+            yield recorder.step(*event)
+
+
+# ——————————————————————————
+# 10. Eventos de parsing (estilo SAX)
+# ——————————————————————————
+EXPAND, MATCH, ERROR, ACCEPT = range(4)
+
+
+class ParseHandler:
+    """
+    Suscriptor de eventos de run_parse. Las subclases redefinen solo los
+    métodos que necesitan; símbolos y producciones son ids de CompiledTable.
+    """
+
+    def expand(self, symbol, production, position):
+        pass
+
+    def match(self, symbol, position):
+        pass
+
+    def error(self, symbol, code, position, token):
+        pass
+
+    def accept(self, position):
+        pass
+
+
+class TimedHandler(ParseHandler):
+    """
+    Envuelve un handler y acumula en seconds el tiempo pasado en sus métodos,
+    para separar su parte de la pasada de run_parse (p. ej. el TreeBuilder en
+    la fase "tree" del perfil). Añade dos lecturas de reloj por evento: solo
+    tiene sentido con el perfil activo.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.seconds = 0.0
+
+    def expand(self, symbol, production, position):
+        start = time.perf_counter()
+        self.handler.expand(symbol, production, position)
+        self.seconds += time.perf_counter() - start
+
+    def match(self, symbol, position):
+        start = time.perf_counter()
+        self.handler.match(symbol, position)
+        self.seconds += time.perf_counter() - start
+
+    def error(self, symbol, code, position, token):
+        start = time.perf_counter()
+        self.handler.error(symbol, code, position, token)
+        self.seconds += time.perf_counter() - start
+
+    def accept(self, position):
+        start = time.perf_counter()
+        self.handler.accept(position)
+        self.seconds += time.perf_counter() - start
+
+
+def run_parse(compiled, tokens, *handlers):
+    """
+    Una sola pasada del driver; cada evento se entrega a todos los handlers,
+    de modo que traza y árbol se construyen a la vez (o ninguno de los dos).
+    Devuelve (aceptada, posición del error o None).
+    """
+    for kind, symbol, production, position, token in compiled.events(tokens):
+        if kind == EXPAND:
+            for handler in handlers:
+                handler.expand(symbol, production, position)
+        elif kind == MATCH:
+            for handler in handlers:
+                handler.match(symbol, position)
+        elif kind == ACCEPT:
+            for handler in handlers:
+                handler.accept(position)
+            return True, None
+        else:
+            for handler in handlers:
+                handler.error(symbol, production, position, token)
+            return False, position
+
+
+# ——————————————————————————
+# 11. Entrada de tokens en streaming
+# ——————————————————————————
+# Tamaño de bloque al leer tokens de ficheros, tuberías o sockets
+TOKEN_CHUNK_SIZE = 1 << 16
+
+
+def read_tokens(source, chunk_size=TOKEN_CHUNK_SIZE):
+    """
+    Genera los tokens separados por espacios de una ruta o de un flujo de
+    texto (fichero abierto, sys.stdin, socket.makefile("r")...), leyendo por
+    bloques; un token partido entre dos bloques se completa con el siguiente.
+    Junto con el driver, la memoria usada no depende del tamaño de la entrada.
+    """
+    if isinstance(source, str):
+        with open(source, encoding="utf-8") as f:
+            yield from read_tokens(f, chunk_size)
+        return
+    rest = ""
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        parts = (rest + chunk).split()
+        rest = "" if chunk[-1].isspace() or not parts else parts.pop()
+        yield from parts
+    if rest:
+        yield rest
+
+
+# ——————————————————————————
+# 12. Parsing por lotes en paralelo
+# ——————————————————————————
+# Entradas por tarea enviada a un proceso
+BATCH_CHUNK_SIZE = 256
+
+# Tabla del proceso trabajador (la fija _init_batch_worker)
+_batch_table = None
+
+
+def _init_batch_worker(source):
+    global _batch_table
+    if isinstance(source, str):
+        # Fichero binario: cada proceso lo abre con mmap y comparten las páginas
+        source = load_grammar_binary(source).compiled
+    _batch_table = source
+
+
+def _check_chunk(chunk, compiled=None):
+    check = (compiled or _batch_table).check
+    return [(index, *check(tokens.split() if isinstance(tokens, str) else tokens)) for index, tokens in chunk]
+
+
+def _batch_chunks(inputs, chunk_size):
+    chunk = []
+    for item in enumerate(inputs):
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def check_batch(grammar, inputs, workers=None, chunk_size=BATCH_CHUNK_SIZE, ordered=True):
+    """
+    Comprueba muchas entradas contra una misma gramática en un pool de
+    procesos. grammar es un CompiledTable o la ruta de un fichero de
+    save_grammar_binary; inputs, un iterable de entradas (listas de tokens
+    o cadenas separadas por espacios) que se consume de forma perezosa.
+
+    La tabla se compila una sola vez: con fork los procesos la heredan sin
+    copiarla, y con un fichero binario cada uno lo abre con mmap. Las
+    entradas viajan en bloques de chunk_size y nunca hay más de dos bloques
+    por proceso en vuelo. Genera (índice, aceptada, posición del error,
+    terminales esperados) en el orden de entrada, o según terminan si
+    ordered es False. Con workers=1 se comprueba en este mismo proceso.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = _batch_chunks(inputs, chunk_size)
+    if workers == 1:
+        compiled = load_grammar_binary(grammar).compiled if isinstance(grammar, str) else grammar
+        for chunk in chunks:
+            yield from _check_chunk(chunk, compiled)
+        return
+
+    import multiprocessing
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    limit = 2 * workers
+    with ProcessPoolExecutor(workers, context, _init_batch_worker, (grammar,)) as pool:
+        pending = OrderedDict()
+        for chunk in chunks:
+            pending[pool.submit(_check_chunk, chunk)] = None
+            if len(pending) < limit:
+                continue
+            if ordered:
+                yield from pending.popitem(last=False)[0].result()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del pending[future]
+                    yield from future.result()
+        if ordered:
+            for future in pending:
+                yield from future.result()
+        else:
+            for future in wait(pending).done:
+                yield from future.result()
+
+
+# ——————————————————————————
+# 13. Lexer derivado de la gramática
+# ——————————————————————————
+# Clases de tokens por defecto para terminales habituales
+DEFAULT_TOKEN_CLASSES = {
+    "id": r"[A-Za-z_][A-Za-z0-9_]*",
+    "num": r"[0-9]+(?:\.[0-9]+)?",
+}
+
+
+class Lexer:
+    """
+    Lexer compilado a partir de los terminales de la tabla: una única regex
+    con todas las alternativas, recorrida de una vez con finditer.
+
+    - Los terminales literales se prueban de más largo a más corto, así que
+      gana la coincidencia más larga ("<=" antes que "<").
+    - Un literal que termina en letra o dígito no se acepta si continúa una
+      palabra: "if" es palabra reservada, pero "iffy" lo reconoce la clase id.
+    - classes asocia terminales como id/num a regex (por defecto
+      DEFAULT_TOKEN_CLASSES, solo las de terminales presentes). Entre clases
+      gana la primera que coincide, en el orden del diccionario, y un lexema
+      igual al nombre de un terminal ("num", "id") es ese terminal.
+    """
+
+    def __init__(self, terminals, classes=None, skip=r"\s*"):
+        terminals = [t for t in terminals if t != "$"]
+        if classes is None:
+            classes = {t: rx for t, rx in DEFAULT_TOKEN_CLASSES.items() if t in terminals}
+        literals = sorted((t for t in terminals if t not in classes), key=len, reverse=True)
+        # Un lexema de clase que coincide con un nombre de terminal es ese terminal
+        self.reserved = set(terminals)
+        self.class_terminal = {}
+        alternatives = []
+        if literals:
+            word_end = r"(?![A-Za-z0-9_])"
+            alternatives.append(
+                "(?P<_lit>%s)"
+                % "|".join(re.escape(t) + (word_end if t[-1].isalnum() or t[-1] == "_" else "") for t in literals)
+            )
+        for k, (terminal, regex) in enumerate(classes.items()):
+            self.class_terminal[f"c{k}"] = terminal
+            alternatives.append(f"(?P<c{k}>{regex})")
+        # El separador va como prefijo: una sola coincidencia por token
+        self.skip = re.compile(skip)
+        self.pattern = re.compile("%s(?:%s)" % (skip, "|".join(alternatives) or "(?!)"))
+
+    def lex(self, text):
+        """Genera (terminal, lexema, desplazamiento) para cada token de text."""
+        class_terminal, reserved = self.class_terminal, self.reserved
+        pos = 0
+        for m in self.pattern.finditer(text):
+            if m.start() != pos:
+                break
+            pos = m.end()
+            group = m.lastgroup
+            lexeme = m[group]
+            if group == "_lit" or lexeme in reserved:
+                yield lexeme, lexeme, m.start(group)
+            else:
+                yield class_terminal[group], lexeme, m.start(group)
+        self._check_end(text, pos)
+
+    def tokenize(self, text):
+        """Genera solo los terminales, listos para el driver LL(1)."""
+        class_terminal, reserved = self.class_terminal, self.reserved
+        pos = 0
+        for m in self.pattern.finditer(text):
+            if m.start() != pos:
+                break
+            pos = m.end()
+            group = m.lastgroup
+            lexeme = m[group]
+            yield lexeme if group == "_lit" or lexeme in reserved else class_terminal[group]
+        self._check_end(text, pos)
+
+    def _check_end(self, text, pos):
+        pos = self.skip.match(text, pos).end()
+        if pos < len(text):
+            line = text.count("\n", 0, pos) + 1
+            column = pos - text.rfind("\n", 0, pos)
+            raise ValueError(f"Carácter inesperado `{text[pos]}` en la línea {line}, columna {column}")
+
+    def tokenize_file(self, source):
+        """Como tokenize, leyendo una ruta o flujo línea a línea (los tokens no cruzan líneas)."""
+        if isinstance(source, str):
+            with open(source, encoding="utf-8") as f:
+                yield from self.tokenize_file(f)
+            return
+        for line in source:
+            yield from self.tokenize(line)
+
+
+# ——————————————————————————
+# 14. Generador de parsers independientes
+# ——————————————————————————
+# Cabecera común de los módulos generados
+_GENERATED_HEADER = '''"""
+Parser LL(1) generado por ll1.py para la gramática con símbolo inicial {start}.
+No depende de nada fuera de la biblioteca estándar; no editar a mano.
+
+parse(tokens) -> (derivación, error): ids de producción aplicados (ver
+PRODUCTIONS) y None si se acepta, o (posición, mensaje).
+"""
+
+PRODUCTIONS = {productions}
+'''
+
+_GENERATED_FOOTER = '''
+
+def recognize(tokens):
+    """(aceptada, posición del error o None)."""
+    _, error = parse(tokens)
+    return error is None, error and error[0]
+
+
+if __name__ == "__main__":
+    import sys
+
+    derivation, error = parse(sys.stdin.read().split())
+    for p in derivation:
+        print(PRODUCTIONS[p])
+    if error is not None:
+        print(f"{{error[1]}} (token {{error[0]}})", file=sys.stderr)
+        sys.exit(1)
+'''
+
+
+def generate_parser(grammar, table, terminals, empty_sym, style="table", start=None):
+    """
+    Código fuente de un módulo Python autónomo que reconoce la gramática, a
+    partir de la salida de compute_parse_table. Con style="table" la tabla se
+    emite como diccionarios literales y un bucle de pila; con style="descent"
+    se emite una función por no-terminal que elige producción según el
+    lookahead (la recursión por la derecha en la última posición se convierte
+    en bucle, así que la profundidad solo crece con el anidamiento).
+
+    Derivación, posiciones y mensajes de error son los de CompiledTable.parse,
+    salvo que con style="descent" la profundidad de anidamiento está
+    limitada por la pila de Python: pasado el límite de recursión, parse
+    devuelve el error "anidamiento demasiado profundo" en la posición
+    alcanzada, aunque la entrada sea válida.
+    """
+    compiled = CompiledTable(grammar, table, terminals, empty_sym, start=start)
+    header = _GENERATED_HEADER.format(
+        start=compiled.symbols[compiled.start],
+        productions=_literal([compiled.production_text(p) for p in range(len(compiled.productions))]),
+    )
+    if style == "table":
+        body = _generate_table_driver(compiled)
+    elif style == "descent":
+        body = _generate_descent(compiled)
+    else:
+        raise ValueError(f"Estilo de parser desconocido: {style}")
+    return header + body + _GENERATED_FOOTER.format()
+
+
+def _literal(values):
+    """Tupla literal con un elemento por línea."""
+    return "(\n" + "".join(f"    {v!r},\n" for v in values) + ")"
+
+
+def _rows(compiled):
+    """Por no-terminal, {terminal: id de producción} con las celdas no vacías."""
+    N = compiled.n_nonterminals
+    rows = []
+    for A in range(N):
+        row = {}
+        for t in range(N, N + compiled.n_terminals):
+            p = compiled.lookup(A, t)
+            if p != -1:
+                row[compiled.symbols[t]] = p
+        rows.append(row)
+    return rows
+
+
+def _generate_table_driver(compiled):
+    symbols = compiled.symbols
+    lines = ["", "# No-terminal -> {lookahead: producción}; -2 = recursión izquierda", "TABLE = {"]
+    for A, row in enumerate(_rows(compiled)):
+        lines.append(f"    {symbols[A]!r}: {row!r},")
+    lines.append("}")
+    lines.append("# Cuerpos invertidos, listos para apilar")
+    lines.append("RHS = " + _literal(tuple(symbols[s] for s in body) for body in compiled.reversed_productions))
+    lines.append(
+        f'''
+
+def parse(tokens):
+    tokens = iter(tokens)
+    current = next(tokens, "$")
+    stack = ["$", {symbols[compiled.start]!r}]
+    pop, extend = stack.pop, stack.extend
+    derivation = []
+    append = derivation.append
+    i = 0
+    while True:
+        top = pop()
+        row = TABLE.get(top)
+        if row is not None:
+            p = row.get(current, -1)
+            if p < 0:
+                if p == -2:
+                    return derivation, (i, f"Error: recursión izquierda en {{top}} con {{current}}")
+                return derivation, (i, f"Error: no regla para {{top}} con {{current}}")
+            append(p)
+            extend(RHS[p])
+        elif top == current:
+            if top == "$":
+                return derivation, None
+            i += 1
+            current = next(tokens, "$")
+        else:
+            return derivation, (i, f"Error: expected {{top}}, got {{current}}")'''
+    )
+    return "\n".join(lines)
+
+
+def _generate_descent(compiled):
+    symbols, N = compiled.symbols, compiled.n_nonterminals
+    lines = [
+        '''
+
+class ParseError(Exception):
+    def __init__(self, position, message):
+        super().__init__(message)
+        self.position = position
+        self.message = message
+
+
+class _State:
+    __slots__ = ("tokens", "current", "i", "derivation")
+
+    def __init__(self, tokens):
+        self.tokens = iter(tokens)
+        self.current = next(self.tokens, "$")
+        self.i = 0
+        self.derivation = []
+
+
+def _expect(s, terminal):
+    if s.current != terminal:
+        raise ParseError(s.i, f"Error: expected {terminal}, got {s.current}")
+    s.i += 1
+    s.current = next(s.tokens, "$")'''
+    ]
+    for A, row in enumerate(_rows(compiled)):
+        groups = {}
+        for t, p in row.items():
+            groups.setdefault(p, []).append(t)
+        # Recursión por la derecha en la última posición: se itera en vez de llamar
+        loops = any(p >= 0 and compiled.productions[p][-1:] == (A,) for p in groups)
+        indent = "        " if loops else "    "
+        lines.append("")
+        lines.append("")
+        lines.append(f"def _n{A}(s):")
+        lines.append(f"    # {symbols[A]}")
+        if loops:
+            lines.append("    while True:")
+        lines.append(f"{indent}t = s.current")
+        keyword = "if"
+        for p, lookaheads in groups.items():
+            if len(lookaheads) == 1:
+                test = f"t == {lookaheads[0]!r}"
+            else:
+                test = "t in {%s}" % ", ".join(map(repr, lookaheads))
+            lines.append(f"{indent}{keyword} {test}:")
+            keyword = "elif"
+            inner = indent + "    "
+            if p == LOOPING_CELL:
+                lines.append(
+                    f"{inner}raise ParseError(s.i, f\"Error: recursión izquierda en {symbols[A]} con {{t}}\")"
+                )
+                continue
+            lines.append(f"{inner}s.derivation.append({p})")
+            body = compiled.productions[p]
+            tail = loops and body[-1:] == (A,)
+            for k, sym in enumerate(body):
+                if tail and k == len(body) - 1:
+                    lines.append(f"{inner}continue")
+                elif sym < N:
+                    lines.append(f"{inner}_n{sym}(s)")
+                elif k == 0 and lookaheads == [symbols[sym]]:
+                    # El lookahead ya es este terminal: basta con avanzar
+                    lines.append(f"{inner}s.i += 1")
+                    lines.append(f"{inner}s.current = next(s.tokens, \"$\")")
+                else:
+                    lines.append(f"{inner}_expect(s, {symbols[sym]!r})")
+            if loops and not tail:
+                lines.append(f"{inner}return")
+        fail = f"raise ParseError(s.i, f\"Error: no regla para {symbols[A]} con {{t}}\")"
+        if groups:
+            lines.append(f"{indent}else:")
+            lines.append(f"{indent}    {fail}")
+        else:
+            lines.append(f"{indent}{fail}")
+    lines.append(
+        f'''
+
+def parse(tokens):
+    s = _State(tokens)
+    try:
+        _n{compiled.start}(s)
+        _expect(s, "$")
+    except ParseError as e:
+        return s.derivation, (e.position, e.message)
+    except RecursionError:
+        # Solo con anidamientos de cientos de niveles (sys.getrecursionlimit)
+        return s.derivation, (s.i, f"Error: anidamiento demasiado profundo con {{s.current}}")
+    return s.derivation, None'''
+    )
+    return "\n".join(lines)
+
+
+# ——————————————————————————
+# 15. Formato binario de gramáticas compiladas
+# ——————————————————————————
+GRAMMAR_FILE_MAGIC = b"LL1G"
+# Cambia cuando cambia la disposición del fichero
+GRAMMAR_FILE_VERSION = 1
+# magic, versión, formato de tabla (0 denso, 1 CSR), clave de la gramática fuente, CRC32 del resto
+_GRAMMAR_HEADER = struct.Struct("<4sHH32sI")
+# no-terminales, terminales, inicial, producciones, palabras de 32 bits por conjunto, celdas llenas
+_GRAMMAR_COUNTS = struct.Struct("<6i")
+# Cada sección ocupa (desplazamiento, longitud) en el directorio, en este orden
+_GRAMMAR_SECTIONS = (
+    "symbols",
+    "production_lhs",
+    "production_ptr",
+    "production_body",
+    "first",
+    "follow",
+    "cells",
+    "row_ptr",
+    "col_idx",
+    "values",
+)
+_GRAMMAR_DIRECTORY = struct.Struct("<%dQ" % (2 * len(_GRAMMAR_SECTIONS)))
+
+
+def save_grammar_binary(path, text, empty_sym, results=None):
+    """
+    Guarda la gramática analizada en el formato binario: tabla de símbolos,
+    producciones, FIRST/FOLLOW como bitsets (un bit por terminal más uno
+    para ε) y la tabla compilada tal cual (densa o CSR), todo en int32
+    little-endian alineado. results es la salida de analyze_grammar_text
+    para text (se calcula si no se pasa); grammar_key(text, empty_sym)
+    queda en la cabecera para detectar ficheros desactualizados.
+    """
+    if results is None:
+        results = analyze_grammar_text(text, empty_sym)
+    compiled = results["compiled"]
+    N, T = compiled.n_nonterminals, compiled.n_terminals
+    words = (T + 1 + 31) // 32
+    nbytes = 4 * words
+
+    def bitsets(sets):
+        index = {t: compiled.terminal_id[t] - N for t in compiled.terminals}
+        index[empty_sym] = T
+        out = bytearray()
+        for A in compiled.nonterminals:
+            mask = 0
+            for t in sets[A]:
+                mask |= 1 << index[t]
+            out += mask.to_bytes(nbytes, "little")
+        return out
+
+    ptr = [0]
+    body = []
+    for prod in compiled.productions:
+        body.extend(prod)
+        ptr.append(len(body))
+    sections = {
+        "symbols": "\0".join([empty_sym] + compiled.symbols).encode("utf-8"),
+        "production_lhs": _int32_bytes(compiled.production_lhs),
+        "production_ptr": _int32_bytes(ptr),
+        "production_body": _int32_bytes(body),
+        "first": bitsets(results["first"]),
+        "follow": bitsets(results["follow"]),
+    }
+    if compiled.layout == "dense":
+        sections["cells"] = _int32_bytes(compiled.cells)
+    else:
+        sections["row_ptr"] = _int32_bytes(compiled.row_ptr)
+        sections["col_idx"] = _int32_bytes(compiled.col_idx)
+        sections["values"] = _int32_bytes(compiled.values)
+
+    counts = _GRAMMAR_COUNTS.pack(N, T, compiled.start, len(compiled.productions), words, compiled.filled)
+    offset = _GRAMMAR_HEADER.size + len(counts) + _GRAMMAR_DIRECTORY.size
+    directory = []
+    payload = bytearray()
+    for name in _GRAMMAR_SECTIONS:
+        data = sections.get(name, b"")
+        # Secciones alineadas a 8 bytes para poder verlas como int32 sin copiar
+        padding = -(offset + len(payload)) % 8
+        payload += bytes(padding)
+        directory += [offset + len(payload), len(data)]
+        payload += data
+    rest = counts + _GRAMMAR_DIRECTORY.pack(*directory) + payload
+    header = _GRAMMAR_HEADER.pack(
+        GRAMMAR_FILE_MAGIC,
+        GRAMMAR_FILE_VERSION,
+        0 if compiled.layout == "dense" else 1,
+        bytes.fromhex(grammar_key(text, empty_sym)),
+        zlib.crc32(rest),
+    )
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(header)
+        f.write(rest)
+    os.replace(tmp, path)
+
+
+def _int32_bytes(values):
+    data = array("i", values)
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data.tobytes()
+
+
+def load_grammar_binary(path, text=None, empty_sym=None, verify=False):
+    """
+    Abre un fichero de save_grammar_binary. Con text (y empty_sym) se
+    comprueba que el fichero corresponde a esa gramática; con verify se
+    comprueba además el CRC32 (lo que obliga a leer el fichero entero).
+    """
+    grammar_file = GrammarFile(path)
+    try:
+        if text is not None and grammar_file.source_key != grammar_key(text, empty_sym):
+            raise ValueError(f"`{path}` está desactualizado respecto a la gramática fuente")
+        if verify:
+            grammar_file.verify()
+    except ValueError:
+        grammar_file.close()
+        raise
+    return grammar_file
+
+
+class GrammarFile:
+    """
+    Gramática compilada abierta con mmap en solo lectura. La tabla (cells o
+    row_ptr/col_idx/values) y los bitsets son vistas sobre el fichero, sin
+    copias: varios procesos que abren el mismo fichero comparten esas
+    páginas. compiled es un CompiledTable normal (parse, recognize, events,
+    trace) que deja de ser utilizable tras close().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views = []
+        view = self._view(0, len(self._mmap))
+        try:
+            magic, version, layout, key, self.crc = _GRAMMAR_HEADER.unpack_from(view)
+        except struct.error:
+            magic = None
+        if magic != GRAMMAR_FILE_MAGIC:
+            self.close()
+            raise ValueError(f"`{path}` no es un fichero de gramática compilada")
+        if version != GRAMMAR_FILE_VERSION:
+            self.close()
+            raise ValueError(f"`{path}` tiene la versión {version} del formato; se esperaba {GRAMMAR_FILE_VERSION}")
+        self.source_key = key.hex()
+        if len(view) < _GRAMMAR_HEADER.size + _GRAMMAR_COUNTS.size + _GRAMMAR_DIRECTORY.size:
+            self._invalid("cabecera incompleta")
+        N, T, start, n_productions, self.words, filled = _GRAMMAR_COUNTS.unpack_from(view, _GRAMMAR_HEADER.size)
+        directory = _GRAMMAR_DIRECTORY.unpack_from(view, _GRAMMAR_HEADER.size + _GRAMMAR_COUNTS.size)
+        self.sections = {
+            name: (directory[2 * k], directory[2 * k + 1]) for k, name in enumerate(_GRAMMAR_SECTIONS)
+        }
+        self._check_sections(layout, N, T, start, n_productions)
+
+        try:
+            names = bytes(self._section("symbols")).decode("utf-8").split("\0")
+        except UnicodeDecodeError:
+            names = []
+        if len(names) != 1 + N + T:
+            self._invalid("tabla de símbolos")
+        compiled = CompiledTable.__new__(CompiledTable)
+        compiled._intern(names[1 : N + 1], names[N + 1 :], names[0])
+        compiled.start = start
+        lhs, ptr, body = (self._ints(name) for name in ("production_lhs", "production_ptr", "production_body"))
+        compiled.production_lhs = list(lhs)
+        compiled.productions = [tuple(body[ptr[p] : ptr[p + 1]]) for p in range(n_productions)]
+        # Las producciones ya se leen enteras: validarlas no cuesta otra pasada
+        if (
+            any(not 0 <= A < N for A in compiled.production_lhs)
+            or any(ptr[p] > ptr[p + 1] for p in range(n_productions))
+            or ptr[n_productions] != len(body)
+            or any(not 0 <= s < N + T for s in body)
+        ):
+            self._invalid("producciones")
+        compiled.reversed_productions = [prod[::-1] for prod in compiled.productions]
+        compiled.filled = filled
+        compiled.fill_ratio = filled / (N * T) if N * T else 0.0
+        if layout == 0:
+            compiled.layout = "dense"
+            compiled.cells = self._ints("cells")
+        else:
+            compiled.layout = "csr"
+            compiled.row_ptr = self._ints("row_ptr")
+            compiled.col_idx = self._ints("col_idx")
+            compiled.values = self._ints("values")
+        self.compiled = compiled
+
+    def _invalid(self, what):
+        self.close()
+        raise ValueError(f"`{self.path}` está truncado o dañado ({what})")
+
+    def _check_sections(self, layout, N, T, start, n_productions):
+        """
+        Comprueba con el directorio, sin leer las secciones, que todas caben
+        en el fichero y tienen el tamaño que dictan los contadores.
+        """
+        if min(N, T, n_productions, self.words) < 0 or not 0 <= start < max(N, 1) or layout not in (0, 1):
+            self._invalid("contadores")
+        expected = {
+            "production_lhs": 4 * n_productions,
+            "production_ptr": 4 * (n_productions + 1),
+            "first": 4 * self.words * N,
+            "follow": 4 * self.words * N,
+        }
+        if layout == 0:
+            expected.update(cells=4 * N * T, row_ptr=0, col_idx=0, values=0)
+        else:
+            expected.update(cells=0, row_ptr=4 * (N + 1), values=self.sections["col_idx"][1])
+        size = len(self._mmap)
+        for name, (offset, length) in self.sections.items():
+            if offset + length > size or (name != "symbols" and (offset % 4 or length % 4)):
+                self._invalid(f"sección {name}")
+            if expected.get(name, length) != length:
+                self._invalid(f"sección {name}")
+
+    def _view(self, offset, length):
+        view = memoryview(self._mmap)[offset : offset + length]
+        self._views.append(view)
+        return view
+
+    def _section(self, name):
+        return self._view(*self.sections[name])
+
+    def _ints(self, name):
+        if sys.byteorder == "big":
+            data = array("i", self._section(name))
+            data.byteswap()
+            return data
+        view = self._section(name).cast("i")
+        self._views.append(view)
+        return view
+
+    def verify(self):
+        start = _GRAMMAR_HEADER.size
+        if zlib.crc32(self._view(start, len(self._mmap) - start)) != self.crc:
+            raise ValueError(f"`{self.path}` está dañado (CRC32 no coincide)")
+
+    def _mask(self, name, A):
+        nbytes = 4 * self.words
+        offset = self.sections[name][0] + self.compiled.symbol_id[A] * nbytes
+        return int.from_bytes(self._mmap[offset : offset + nbytes], "little")
+
+    def _set(self, name, A):
+        compiled = self.compiled
+        mask = self._mask(name, A)
+        result = _bits_to_set(mask & ((1 << compiled.n_terminals) - 1), compiled.terminals)
+        if mask >> compiled.n_terminals & 1:
+            result.add(compiled.empty_sym)
+        return result
+
+    def first(self, A):
+        return self._set("first", A)
+
+    def follow(self, A):
+        return self._set("follow", A)
+
+    def first_sets(self):
+        return {A: self.first(A) for A in self.compiled.nonterminals}
+
+    def follow_sets(self):
+        return {A: self.follow(A) for A in self.compiled.nonterminals}
+
+    def parse_table(self):
+        """
+        (tabla, terminales) como compute_parse_table. ε solo aparece en las
+        producciones vacías y las celdas LOOPING_CELL quedan vacías.
+        """
+        compiled = self.compiled
+        N, symbols = compiled.n_nonterminals, compiled.symbols
+        bodies = [[symbols[s] for s in prod] or [compiled.empty_sym] for prod in compiled.productions]
+        table = {}
+        for A in range(N):
+            row = table[symbols[A]] = {}
+            for t in range(N, N + compiled.n_terminals):
+                p = compiled.lookup(A, t)
+                row[symbols[t]] = bodies[p] if p >= 0 else None
+        return table, list(compiled.terminals)
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ——————————————————————————
+# 16. Caché de análisis compartida
+# ——————————————————————————
+# Cambia cuando cambia la forma de los resultados guardados
+ANALYSIS_CACHE_VERSION = 3
+ANALYSIS_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def analyze_grammar_text(text, empty_sym, profile=NULL_PROFILE):
+    """
+    Todo el pipeline de análisis: del texto de la gramática a tabla, driver y
+    lexer. Con un Profile se mide cada fase (scan, first, follow, table,
+    compile, lexer).
+    """
+    with profile.phase("scan") as metrics:
+        grammar = parse_grammar_with_scanner(text, empty_sym)
+    metrics["rules"] = len(grammar)
+    if not grammar:
+        raise ValueError("la gramática no tiene reglas")
+    stats = {}
+    analysis = GrammarAnalysis(grammar, empty_sym, stats, profile)
+    with profile.phase("table"):
+        table, terminals = analysis.parse_table()
+        first, follow = analysis.first_sets(), analysis.follow_sets()
+    with profile.phase("compile") as metrics:
+        compiled = CompiledTable(grammar, table, terminals, empty_sym)
+    metrics.update(layout=compiled.layout, filled=compiled.filled, fill_ratio=compiled.fill_ratio)
+    with profile.phase("lexer"):
+        lexer = Lexer(terminals)
+    return {
+        "grammar": grammar,
+        "first": first,
+        "follow": follow,
+        "table": table,
+        "terminals": terminals,
+        "start": analysis.start,
+        "stats": stats,
+        "compiled": compiled,
+        "lexer": lexer,
+    }
+
+
+def grammar_key(text, empty_sym):
+    """
+    Hash de contenido de la gramática: se ignoran líneas vacías y espacios
+    repetidos, que no cambian lo que produce el scanner.
+    """
+    normalized = "\n".join(" ".join(line.split()) for line in text.splitlines() if line.strip())
+    payload = f"{ANALYSIS_CACHE_VERSION}\0{empty_sym}\0{normalized}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """
+    Caché de resultados de analyze_grammar_text compartida por todo el
+    proceso, indexada por grammar_key. En memoria es LRU y está acotada por
+    el tamaño serializado (pickle) de las entradas; con directory se añade un
+    nivel en disco que sobrevive a reinicios. Los resultados se comparten
+    entre sesiones y deben tratarse como solo lectura.
+    """
+
+    def __init__(self, max_bytes=ANALYSIS_CACHE_BYTES, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.entries = OrderedDict()  # clave -> (resultados, bytes)
+        self.size = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".pickle")
+
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        if self.directory and os.path.exists(self._path(key)):
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+            results = pickle.loads(data)
+            with self._lock:
+                self.disk_hits += 1
+                self._insert(key, results, len(data))
+            return results
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, results):
+        data = pickle.dumps(results, protocol=pickle.HIGHEST_PROTOCOL)
+        if self.directory:
+            # Escritura atómica: otro proceso nunca ve un fichero a medias
+            tmp = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self._path(key))
+        with self._lock:
+            self._insert(key, results, len(data))
+
+    def _insert(self, key, results, nbytes):
+        if key in self.entries:
+            self.size -= self.entries.pop(key)[1]
+        if nbytes > self.max_bytes:
+            return
+        self.entries[key] = (results, nbytes)
+        self.size += nbytes
+        while self.size > self.max_bytes:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.size -= evicted
+
+    def analyze(self, text, empty_sym):
+        """analyze_grammar_text con caché; los errores de la gramática no se guardan."""
+        key = grammar_key(text, empty_sym)
+        results = self.get(key)
+        if results is None:
+            results = analyze_grammar_text(text, empty_sym)
+            self.put(key, results)
+        return results
+
+
+# ——————————————————————————
+# 17. Análisis masivo de gramáticas
+# ——————————————————————————
+# Segundos que puede tardar cada gramática antes de abandonarla
+BULK_TIMEOUT = 10.0
+
+
+def iter_grammar_sources(path):
+    """
+    (nombre, texto) de cada gramática de path: un directorio (recursivo, sin
+    ficheros ocultos), un .zip, un .tar (también comprimido) o un fichero
+    suelto. Los nombres son relativos al directorio o al archivo.
+    """
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+            for name in sorted(files):
+                if not name.startswith("."):
+                    full = os.path.join(root, name)
+                    with open(full, "rb") as f:
+                        yield os.path.relpath(full, path), f.read().decode("utf-8", "replace")
+        return
+
+    import tarfile
+    import zipfile
+
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    yield info.filename, archive.read(info).decode("utf-8", "replace")
+    elif tarfile.is_tarfile(path):
+        with tarfile.open(path) as archive:
+            for member in archive:
+                if member.isfile():
+                    yield os.path.normpath(member.name), archive.extractfile(member).read().decode("utf-8", "replace")
+    else:
+        with open(path, "rb") as f:
+            yield os.path.basename(path), f.read().decode("utf-8", "replace")
+
+
+def grammar_report(text, empty_sym):
+    """
+    Informe de una gramática para analyze_bulk, serializable en JSON:
+    FIRST, FOLLOW, tabla (producciones como texto), conflictos LL(1) y el
+    tiempo de cada fase. Los errores de la gramática no se propagan: se
+    devuelven con status "error".
+    """
+    profile = Profile()
+    try:
+        with profile.phase("scan"):
+            grammar = parse_grammar_with_scanner(text, empty_sym)
+        if not grammar:
+            raise ValueError("la gramática no tiene reglas")
+        analysis = GrammarAnalysis(grammar, empty_sym, profile=profile)
+        with profile.phase("table"):
+            table, terminals = analysis.parse_table()
+            first, follow = analysis.first_sets(), analysis.follow_sets()
+        with profile.phase("conflicts"):
+            conflicts = find_conflicts(grammar, first, follow, empty_sym)
+    except Exception as e:
+        return {"status": "error", "error": f"{type(e).__name__}: {e}"}
+    return {
+        "status": "ok",
+        "start": analysis.start,
+        "terminals": terminals,
+        "first": {A: sorted(s) for A, s in first.items()},
+        "follow": {A: sorted(s) for A, s in follow.items()},
+        "table": {A: {t: " ".join(prod) for t, prod in row.items() if prod} for A, row in table.items()},
+        "ll1": not conflicts,
+        "conflicts": [
+            {"nonterminal": A, "terminal": t, "productions": [" ".join(prod) for prod in prods]}
+            for A, t, prods in conflicts
+        ],
+        "timings": {name: seconds for name, (seconds, _) in profile.phases.items()},
+    }
+
+
+def _bulk_worker(conn, empty_sym):
+    for text in iter(conn.recv, None):
+        conn.send(grammar_report(text, empty_sym))
+
+
+class _BulkWorker:
+    """Proceso de analyze_bulk con su tubería y la gramática que está analizando."""
+
+    def __init__(self, context, empty_sym):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_bulk_worker, args=(child, empty_sym), daemon=True)
+        self.process.start()
+        child.close()
+        self.task = None
+
+    def submit(self, task, text, timeout):
+        self.conn.send(text)
+        self.task = task
+        self.started = time.perf_counter()
+        self.deadline = self.started + timeout
+
+    def close(self, kill=False):
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+        self.process.join()
+        self.conn.close()
+
+
+def analyze_bulk(sources, empty_sym, workers=None, timeout=BULK_TIMEOUT):
+    """
+    Analiza muchas gramáticas en paralelo. sources es un iterable de
+    (nombre, texto), como iter_grammar_sources, que se consume según quedan
+    procesos libres. Genera un informe por fuente, en el orden de entrada,
+    con name, key (grammar_key) y status:
+
+    - "ok" o "error": más los campos de grammar_report y seconds, el tiempo
+      total incluida la comunicación con el proceso;
+    - "timeout": la gramática tardó más de timeout segundos; su proceso se
+      mata y se sustituye por otro;
+    - "duplicate": mismo contenido que duplicate_of, que no se repite.
+    """
+    import multiprocessing
+    from multiprocessing.connection import wait
+
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    pool = [_BulkWorker(context, empty_sym) for _ in range(workers or os.cpu_count() or 1)]
+    sources = iter(sources)
+    exhausted = False
+    seen = {}  # clave -> nombre de la primera gramática con ese contenido
+    running = {}  # índice -> informe a medio rellenar
+    done = {}  # índice -> informe terminado, hasta que le toque salir
+    count = emitted = 0
+    try:
+        while True:
+            # Una gramática nueva para cada proceso libre; los duplicados no ocupan ninguno
+            for worker in pool:
+                while worker.task is None and not exhausted:
+                    item = next(sources, None)
+                    if item is None:
+                        exhausted = True
+                        break
+                    name, text = item
+                    key = grammar_key(text, empty_sym)
+                    report = {"name": name, "key": key}
+                    if key in seen:
+                        done[count] = dict(report, status="duplicate", duplicate_of=seen[key])
+                    else:
+                        seen[key] = name
+                        running[count] = report
+                        worker.submit(count, text, timeout)
+                    count += 1
+            while emitted in done:
+                yield done.pop(emitted)
+                emitted += 1
+            busy = [worker for worker in pool if worker.task is not None]
+            if not busy:
+                break
+            ready = wait([worker.conn for worker in busy], max(0, min(w.deadline for w in busy) - time.perf_counter()))
+            for i, worker in enumerate(pool):
+                if worker.task is None:
+                    continue
+                if worker.conn in ready:
+                    try:
+                        result = worker.conn.recv()
+                    except EOFError:
+                        result = {"status": "error", "error": "el proceso de análisis terminó inesperadamente"}
+                        worker.close(kill=True)
+                        pool[i] = _BulkWorker(context, empty_sym)
+                elif time.perf_counter() >= worker.deadline:
+                    result = {"status": "timeout", "error": f"más de {timeout:g} s"}
+                    worker.close(kill=True)
+                    pool[i] = _BulkWorker(context, empty_sym)
+                else:
+                    continue
+                report = running.pop(worker.task)
+                report.update(result, seconds=time.perf_counter() - worker.started)
+                done[worker.task] = report
+                worker.task = None
+    finally:
+        for worker in pool:
+            worker.close(kill=worker.task is not None)
+
+
+# ——————————————————————————
+# 18. Simulación de parsing LL(1)
+# ——————————————————————————
+# Símbolos de pila y tokens de entrada que muestra cada fila de TraceStore
+TRACE_WINDOW = 30
+
+
+class TraceRecorder(ParseHandler):
+    """
+    Reconstruye los pasos {"Stack", "Input", "Action"} a partir de los eventos.
+    Con limit solo se guardan los primeros pasos y se marca truncated.
+    """
+
+    def __init__(self, compiled, tokens, limit=None):
+        self.compiled = compiled
+        self.tokens = list(tokens) + ["$"]
+        self.limit = limit
+        self.stack = [compiled.end, compiled.start]
+        self.steps = []
+        self.truncated = False
+
+    def step(self, kind, symbol, production, position, current):
+        """Paso de traza para un evento; actualiza la pila reconstruida."""
+        compiled, stack = self.compiled, self.stack
+        step = {
+            "Stack": " ".join([compiled.symbols[s] for s in stack]),
+            "Input": " ".join(self.tokens[position:]),
+            "Action": "",
+        }
+        stack.pop()
+        if kind == EXPAND:
+            step["Action"] = compiled.production_text(production)
+            stack.extend(compiled.reversed_productions[production])
+        elif kind == MATCH:
+            step["Action"] = f"Match {current}"
+        elif kind == ACCEPT:
+            step["Action"] = "Aceptado"
+        else:
+            step["Action"] = compiled.error_message(symbol, production, current)
+        return step
+
+    def _record(self, kind, symbol, production, position):
+        if self.truncated:
+            return
+        if self.limit is not None and len(self.steps) >= self.limit:
+            self.truncated = True
+            return
+        self.steps.append(self.step(kind, symbol, production, position, self.tokens[position]))
+
+    def expand(self, symbol, production, position):
+        self._record(EXPAND, symbol, production, position)
+
+    def match(self, symbol, position):
+        self._record(MATCH, symbol, -1, position)
+
+    def error(self, symbol, code, position, token):
+        self._record(ERROR, symbol, code, position)
+
+    def accept(self, position):
+        self._record(ACCEPT, self.compiled.end, -1, position)
+
+
+class TraceStore(ParseHandler):
+    """
+    Traza completa en formato columnar y codificada por deltas: por paso solo
+    se guardan el tipo de evento, el símbolo desapilado, la producción apilada,
+    el cursor de entrada y la cima de la pila. La pila es una lista enlazada
+    persistente (cell_symbol/cell_next), así que cada paso comparte las celdas
+    de los anteriores. Las cadenas Stack/Input se reconstruyen al indexar:
+    store[k] devuelve el paso k y store[a:b] una lista para pd.DataFrame.
+
+    Al indexar, Stack muestra solo los window símbolos de la cima e Input los
+    window primeros tokens pendientes, con "…" si hay más: con 10⁶ tokens
+    cada fila completa ocuparía megabytes. row(k, None) da la fila entera.
+    """
+
+    def __init__(self, compiled, tokens, window=TRACE_WINDOW):
+        self.compiled = compiled
+        self.tokens = tokens
+        self.window = window
+        self.kind = array("b")
+        self.symbol = array("i")
+        self.production = array("i")
+        self.position = array("i")
+        self.head = array("i")
+        # Pila inicial: $ start
+        self.cell_symbol = array("i", [compiled.end, compiled.start])
+        self.cell_next = array("i", [-1, 0])
+        self._top = 1
+
+    def __len__(self):
+        return len(self.kind)
+
+    def _record(self, kind, symbol, production, position):
+        self.kind.append(kind)
+        self.symbol.append(symbol)
+        self.production.append(production)
+        self.position.append(position)
+        self.head.append(self._top)
+        self._top = self.cell_next[self._top]
+
+    def expand(self, symbol, production, position):
+        self._record(EXPAND, symbol, production, position)
+        top = self._top
+        for s in self.compiled.reversed_productions[production]:
+            self.cell_symbol.append(s)
+            self.cell_next.append(top)
+            top = len(self.cell_next) - 1
+        self._top = top
+
+    def match(self, symbol, position):
+        self._record(MATCH, symbol, -1, position)
+
+    def error(self, symbol, code, position, token):
+        self._record(ERROR, symbol, code, position)
+
+    def accept(self, position):
+        self._record(ACCEPT, self.compiled.end, -1, position)
+
+    def stack_symbols(self, k, limit=None):
+        """Pila (de fondo a cima) antes del paso k; con limit, solo esos símbolos de la cima."""
+        symbols = []
+        cell = self.head[k]
+        while cell >= 0 and len(symbols) != limit:
+            symbols.append(self.cell_symbol[cell])
+            cell = self.cell_next[cell]
+        symbols.reverse()
+        return symbols
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return [self.row(i, self.window) for i in range(*k.indices(len(self)))]
+        if k < 0:
+            k += len(self)
+        if not 0 <= k < len(self):
+            raise IndexError(k)
+        return self.row(k, self.window)
+
+    def row(self, k, window=None):
+        """Paso k con Stack e Input recortados a window símbolos (None: completos)."""
+        compiled = self.compiled
+        kind, symbol, production, position = self.kind[k], self.symbol[k], self.production[k], self.position[k]
+        current = self.tokens[position] if position < len(self.tokens) else "$"
+        if kind == EXPAND:
+            action = compiled.production_text(production)
+        elif kind == MATCH:
+            action = f"Match {current}"
+        elif kind == ACCEPT:
+            action = "Aceptado"
+        else:
+            action = compiled.error_message(symbol, production, current)
+        if window is None:
+            stack = self.stack_symbols(k)
+            pending = self.tokens[position:]
+        else:
+            # Un símbolo más del límite basta para saber si hay que recortar
+            stack = self.stack_symbols(k, window + 1)
+            pending = self.tokens[position : position + window + 1]
+        stack = [compiled.symbols[s] for s in stack]
+        if window is not None and len(stack) > window:
+            stack[: len(stack) - window] = ["…"]
+        if window is not None and len(pending) > window:
+            pending = pending[:window] + ["…"]
+        return {
+            "Stack": " ".join(stack),
+            "Input": " ".join(pending + ["$"]),
+            "Action": action,
+        }
+
+
+def iter_ll1_trace(grammar, table, tokens, start, empty_sym):
+    """Versión perezosa de simulate_ll1: genera los pasos a demanda."""
+    terminals = list(next(iter(table.values())))
+    compiled = CompiledTable(grammar, table, terminals, empty_sym, start=start)
+    return compiled.trace(tokens)
+
+
+def simulate_ll1(grammar, table, tokens, start, empty_sym):
+    return list(iter_ll1_trace(grammar, table, tokens, start, empty_sym))
+
+
+# ——————————————————————————
+# 19. Construir Árbol de Derivación
+# ——————————————————————————
+class Node:
+    __slots__ = ("symbol", "children")
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.children = []
+
+
+class ParseTree:
+    """
+    Árbol de derivación compacto: arrays paralelos de id de símbolo, padre,
+    primer hijo y siguiente hermano (-1 = ninguno), con la raíz en 0. Los
+    nodos se numeran al crearse: los hijos de una expansión quedan
+    contiguos, así que el orden no es preorden (el siguiente hermano de un
+    nodo va antes que su primer hijo). Lo único garantizado es que un padre
+    tiene índice menor que sus hijos, que es lo que usa subtree_sizes.
+    Los objetos Node/NodeView se crean solo cuando se piden.
+    Los primeros n_nonterminals símbolos son no-terminales (si se sabe).
+    """
+
+    def __init__(self, symbols, n_nonterminals=None):
+        self.symbols = symbols
+        self.n_nonterminals = n_nonterminals
+        self.symbol = array("i")
+        self.parent = array("i")
+        self.first_child = array("i")
+        self.next_sibling = array("i")
+
+    def __len__(self):
+        return len(self.symbol)
+
+    def add(self, symbol, parent=-1):
+        index = len(self.symbol)
+        self.symbol.append(symbol)
+        self.parent.append(parent)
+        self.first_child.append(-1)
+        self.next_sibling.append(-1)
+        return index
+
+    def children(self, index):
+        child = self.first_child[index]
+        while child >= 0:
+            yield child
+            child = self.next_sibling[child]
+
+    def view(self, index=0):
+        return NodeView(self, index)
+
+    def subtree_sizes(self):
+        """Nodos de cada subárbol (él incluido); un padre siempre precede a sus hijos."""
+        sizes = array("i", [1]) * len(self.symbol)
+        parent = self.parent
+        for i in range(len(sizes) - 1, 0, -1):
+            sizes[parent[i]] += sizes[i]
+        return sizes
+
+    def is_nonterminal(self, index):
+        symbol = self.symbol[index]
+        if self.n_nonterminals is None:
+            return self.symbols[symbol].islower()
+        return symbol < self.n_nonterminals
+
+    def to_node(self, index=0):
+        """Materializa el subárbol como objetos Node, sin recursión."""
+        root = Node(self.symbols[self.symbol[index]])
+        pending = [(index, root)]
+        while pending:
+            i, node = pending.pop()
+            for child in self.children(i):
+                child_node = Node(self.symbols[self.symbol[child]])
+                node.children.append(child_node)
+                pending.append((child, child_node))
+        return root
+
+
+class NodeView:
+    """Vista tipo Node de un nodo de ParseTree (symbol, children)."""
+
+    __slots__ = ("tree", "index")
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+
+    @property
+    def symbol(self):
+        return self.tree.symbols[self.tree.symbol[self.index]]
+
+    @property
+    def children(self):
+        return [NodeView(self.tree, child) for child in self.tree.children(self.index)]
+
+
+class TreeBuilder(ParseHandler):
+    """
+    Construye un ParseTree a partir de los eventos, con una pila explícita de
+    nodos pendientes que refleja la pila del driver. Si hay un error, el árbol
+    queda parcial justo en ese punto, igual que la traza.
+    """
+
+    def __init__(self, compiled):
+        self.empty = len(compiled.symbols)
+        self.tree = ParseTree(compiled.symbols + [compiled.empty_sym], compiled.n_nonterminals)
+        self.productions = [body or (self.empty,) for body in compiled.productions]
+        self.tree.add(compiled.start)
+        self.pending = [0]
+
+    def expand(self, symbol, production, position):
+        tree, empty = self.tree, self.empty
+        node = self.pending.pop()
+        body = self.productions[production]
+        # Los hermanos quedan contiguos: first, first + 1, ..., last
+        first = len(tree.symbol)
+        last = first + len(body) - 1
+        tree.symbol.extend(body)
+        tree.parent.extend([node] * len(body))
+        tree.first_child.extend([-1] * len(body))
+        tree.next_sibling.extend(range(first + 1, last + 2))
+        tree.next_sibling[last] = -1
+        tree.first_child[node] = first
+        # Se apilan al revés para procesarlos de izquierda a derecha (preorden)
+        for child in range(last, first - 1, -1):
+            if body[child - first] != empty:
+                self.pending.append(child)
+
+    def match(self, symbol, position):
+        self.pending.pop()
+
+
+def build_compact_tree(compiled, tokens):
+    """Construye solo el árbol (ver run_parse para obtener traza y árbol juntos)."""
+    builder = TreeBuilder(compiled)
+    run_parse(compiled, tokens, builder)
+    return builder.tree
+
+
+def build_parse_tree(grammar, table, tokens, start, empty_sym):
+    terminals = list(next(iter(table.values())))
+    compiled = CompiledTable(grammar, table, terminals, empty_sym, start=start)
+    return build_compact_tree(compiled, tokens).to_node()
+
+
+def _node_color(symbol, nonterminal, empty_sym):
+    if symbol == empty_sym:  # Símbolo vacío
+        return "lightyellow"
+    if nonterminal:  # No-terminal
+        return "lightblue"
+    if symbol == "$":  # Fin de cadena
+        return "lightgrey"
+    return "lightgreen"  # Terminal
+
+
+def tree_to_dot(node, empty_sym, dot=None):
+    if dot is None:
+        # graphviz solo hace falta para dibujar: se importa al usarlo
+        import graphviz
+
+        dot = graphviz.Digraph(node_attr={"style": "filled", "shape": "box"})
+    # Pila explícita en preorden: los árboles profundos no agotan la recursión
+    pending = [(node, None)]
+    while pending:
+        node, parent_uid = pending.pop()
+        uid = str(id(node))
+        dot.node(uid, node.symbol, fillcolor=_node_color(node.symbol, node.symbol.islower(), empty_sym))
+        if parent_uid is not None:
+            dot.edge(parent_uid, uid)
+        pending.extend((child, uid) for child in reversed(node.children))
+    return dot
+
+
+# Nodos que se dibujan como máximo si no se pide otra cosa
+TREE_MAX_NODES = 300
+
+
+def select_tree_nodes(tree, root=0, max_depth=None, max_nodes=None, expanded=()):
+    """
+    Nodos visibles del subárbol de root en un ParseTree, por niveles:
+    (nodos en orden, colapsados). Los hijos de un nodo se muestran todos o
+    ninguno; un nodo se colapsa si está a max_depth de root o si sus hijos
+    ya no caben en max_nodes, salvo que esté en expanded.
+    """
+    nodes = [root]
+    depths = [0]
+    collapsed = set()
+    children = tree.children
+    i = 0
+    while i < len(nodes):
+        node, depth = nodes[i], depths[i]
+        i += 1
+        kids = list(children(node))
+        if not kids:
+            continue
+        if node not in expanded and (
+            (max_depth is not None and depth >= max_depth)
+            or (max_nodes is not None and len(nodes) + len(kids) > max_nodes)
+        ):
+            collapsed.add(node)
+            continue
+        nodes += kids
+        depths += [depth + 1] * len(kids)
+    return nodes, collapsed
+
+
+def _dot_quote(text):
+    return '"%s"' % text.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def tree_dot_lines(tree, empty_sym, root=0, max_depth=None, max_nodes=None, expanded=()):
+    """
+    DOT de un ParseTree línea a línea, sin recursión ni graphviz. Los nodos
+    se llaman por su índice en el árbol (n0, n1, ...), así que no cambian de
+    una vista a otra. Cada subárbol colapsado (ver select_tree_nodes) se
+    dibuja como su raíz, con borde discontinuo y el número de nodos ocultos.
+    """
+    nodes, collapsed = select_tree_nodes(tree, root, max_depth, max_nodes, expanded)
+    sizes = tree.subtree_sizes() if collapsed else None
+    yield "digraph {\n"
+    yield "\tnode [shape=box style=filled]\n"
+    for node in nodes:
+        symbol = tree.symbols[tree.symbol[node]]
+        color = _node_color(symbol, tree.is_nonterminal(node), empty_sym)
+        if node in collapsed:
+            label = _dot_quote(f"{symbol} (+{sizes[node] - 1})")
+            yield f'\tn{node} [label={label} fillcolor={color} style="filled,dashed"]\n'
+        else:
+            yield f"\tn{node} [label={_dot_quote(symbol)} fillcolor={color}]\n"
+    parent = tree.parent
+    for node in nodes[1:]:
+        yield f"\tn{parent[node]} -> n{node}\n"
+    yield "}\n"
+
+
+def write_tree_dot(tree, target, empty_sym, **view):
+    """Escribe el DOT en una ruta o flujo según se genera (view: ver tree_dot_lines)."""
+    if isinstance(target, str):
+        with open(target, "w", encoding="utf-8") as f:
+            write_tree_dot(tree, f, empty_sym, **view)
+        return
+    target.writelines(tree_dot_lines(tree, empty_sym, **view))
+
+
+def dot_to_svg(source):
+    """Layout con el programa dot de Graphviz; devuelve el SVG como texto."""
+    import graphviz
+
+    return graphviz.Source(source).pipe(format="svg").decode("utf-8")
@@ -0,0 +1,374 @@
+# server.py
+"""
+Servicio HTTP/JSON del simulador LL(1) sobre asyncio, sin dependencias:
+
+    python server.py --port 8080 --workers 4
+
+Las gramáticas se registran una vez y quedan compiladas en memoria con su
+id (grammar_key); cada petición de parsing solo comprueba entradas.
+
+    POST   /grammars                 {"grammar": "e -> ...", "empty": "ε"}
+    GET    /grammars                 ids registrados
+    GET    /grammars/<id>            start, terminales, conflictos LL(1)
+    DELETE /grammars/<id>
+    POST   /grammars/<id>/parse      {"input": "id + id"} o {"tokens": [...]}
+                                     o por lotes {"inputs": ["id + id", [...], ...]}
+    GET    /stats                    peticiones, cola y latencias (p50/p99)
+
+Cada entrada devuelve {"accepted", "position", "expected"} como
+CompiledTable.check. Los lotes pequeños se comprueban en el propio bucle;
+los grandes van a un pool de procesos que abre la gramática con mmap
+desde el formato binario. Si la cola de trabajos está llena se responde
+503 con Retry-After en lugar de acumular esperas.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+
+import ll1
+
+# Tokens por petición por debajo de los cuales no compensa ir al pool
+INLINE_TOKENS = 4096
+# Trabajos (en cola o en curso) por proceso antes de responder 503
+PENDING_PER_WORKER = 8
+MAX_BODY_BYTES = 16 * 1024 * 1024
+MAX_HEADER_BYTES = 64 * 1024
+# Peticiones cuyas latencias se guardan para /stats
+LATENCY_WINDOW = 10_000
+# Gramáticas abiertas en cada proceso del pool
+WORKER_GRAMMARS = 32
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=()):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers
+
+
+# ——————————————————————————
+# 1. Trabajo en los procesos del pool
+# ——————————————————————————
+# id -> CompiledTable de cada proceso trabajador, LRU
+_worker_grammars = OrderedDict()
+
+
+def _register_grammar(text, empty_sym, path):
+    """Analiza la gramática, la guarda en formato binario y devuelve su ficha."""
+    results = ll1.analyze_grammar_text(text, empty_sym)
+    ll1.save_grammar_binary(path, text, empty_sym, results)
+    conflicts = ll1.find_conflicts(results["grammar"], results["first"], results["follow"], empty_sym)
+    return {
+        "start": results["start"],
+        "nonterminals": list(results["grammar"]),
+        "terminals": results["terminals"],
+        "ll1": not conflicts,
+        "conflicts": [
+            {"nonterminal": A, "terminal": t, "productions": [" ".join(prod) for prod in prods]}
+            for A, t, prods in conflicts
+        ],
+    }
+
+
+def _check_inputs(grammar_id, path, inputs):
+    compiled = _worker_grammars.get(grammar_id)
+    if compiled is None:
+        compiled = _worker_grammars[grammar_id] = ll1.load_grammar_binary(path).compiled
+        if len(_worker_grammars) > WORKER_GRAMMARS:
+            _worker_grammars.popitem(last=False)
+    else:
+        _worker_grammars.move_to_end(grammar_id)
+    return [compiled.check(tokens) for tokens in inputs]
+
+
+def _result(check):
+    accepted, position, expected = check
+    return {"accepted": accepted, "position": position, "expected": list(expected)}
+
+
+# ——————————————————————————
+# 2. Servicio
+# ——————————————————————————
+class ParseService:
+    """
+    Registro de gramáticas y pool de procesos. Con workers=0 todo se hace
+    en el bucle de eventos (útil para pruebas). Como mucho hay
+    max_pending trabajos del pool a la vez, en cola o en curso, y solo
+    2 × workers en curso.
+    """
+
+    def __init__(self, workers=None, max_pending=None, state_dir=None):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_pending = max_pending or PENDING_PER_WORKER * max(1, self.workers)
+        self.pending = 0
+        self.running = asyncio.Semaphore(2 * max(1, self.workers))
+        self.own_dir = state_dir is None
+        self.state_dir = tempfile.mkdtemp(prefix="ll1-") if state_dir is None else state_dir
+        self.grammars = {}  # id -> (ficha, GrammarFile)
+        self.stats = {"requests": 0, "inputs": 0, "offloaded": 0, "overloaded": 0, "errors": 0}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.pool = self.make_pool() if self.workers else None
+
+    def make_pool(self):
+        """
+        Pool con forkserver (o spawn) y no fork: los procesos se crean al
+        llegar el primer trabajo, cuando ya hay sockets abiertos, y con fork
+        heredarían el socket de escucha y las conexiones de los clientes,
+        que no verían nunca el fin de la respuesta.
+        """
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        return ProcessPoolExecutor(self.workers, context)
+
+    async def offload(self, fn, *args):
+        """fn(*args) en el pool; HTTPError 503 si la cola está llena."""
+        if self.pending >= self.max_pending:
+            self.stats["overloaded"] += 1
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "servicio saturado", [("Retry-After", "1")])
+        if self.pool is None:
+            return fn(*args)
+        self.pending += 1
+        pool = self.pool
+        try:
+            async with self.running:
+                self.stats["offloaded"] += 1
+                return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+        except BrokenProcessPool:
+            # Un proceso ha muerto y el pool ya no acepta trabajos: se sustituye una sola vez
+            if self.pool is pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+                self.pool = self.make_pool()
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "proceso del pool caído", [("Retry-After", "1")])
+        finally:
+            self.pending -= 1
+
+    async def register(self, body):
+        text = body.get("grammar")
+        empty_sym = body.get("empty", "ε")
+        if not isinstance(text, str) or not isinstance(empty_sym, str):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "se esperaba {\"grammar\": texto, \"empty\": símbolo}")
+        grammar_id = ll1.grammar_key(text, empty_sym)
+        if grammar_id in self.grammars:
+            return HTTPStatus.OK, dict(self.grammars[grammar_id][0])
+        path = os.path.join(self.state_dir, grammar_id + ".ll1")
+        try:
+            info = await self.offload(_register_grammar, text, empty_sym, path)
+        except ValueError as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, str(e))
+        info = {"id": grammar_id, "empty": empty_sym, **info}
+        # Otra petición con la misma gramática pudo terminar antes
+        if grammar_id not in self.grammars:
+            self.grammars[grammar_id] = (info, ll1.load_grammar_binary(path))
+        return HTTPStatus.CREATED, dict(info)
+
+    def lookup(self, grammar_id):
+        entry = self.grammars.get(grammar_id)
+        if entry is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"no hay ninguna gramática con id {grammar_id}")
+        return entry
+
+    async def parse(self, grammar_id, body):
+        _, grammar_file = self.lookup(grammar_id)
+        if "inputs" in body:
+            inputs, batched = body["inputs"], True
+        elif "tokens" in body or "input" in body:
+            inputs, batched = [body.get("tokens", body.get("input"))], False
+        else:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "se esperaba \"input\", \"tokens\" o \"inputs\"")
+        if not isinstance(inputs, list):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "\"inputs\" debe ser una lista")
+        token_lists = []
+        for item in inputs:
+            if isinstance(item, str):
+                item = item.split()
+            elif not isinstance(item, list) or not all(isinstance(tok, str) for tok in item):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "cada entrada es un texto o una lista de tokens")
+            token_lists.append(item)
+        self.stats["inputs"] += len(token_lists)
+        if self.pool is None or sum(map(len, token_lists)) <= INLINE_TOKENS:
+            # Más barato que el viaje de ida y vuelta al pool
+            check = grammar_file.compiled.check
+            checks = [check(tokens) for tokens in token_lists]
+        else:
+            checks = await self.offload(_check_inputs, grammar_id, grammar_file.path, token_lists)
+        results = [_result(c) for c in checks]
+        return HTTPStatus.OK, {"results": results} if batched else results[0]
+
+    def delete(self, grammar_id):
+        _, grammar_file = self.lookup(grammar_id)
+        del self.grammars[grammar_id]
+        grammar_file.close()
+        os.remove(grammar_file.path)
+        return HTTPStatus.OK, {"deleted": grammar_id}
+
+    def report(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(q):
+            return latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else None
+
+        return {
+            **self.stats,
+            "grammars": len(self.grammars),
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "latency_ms": {"p50": percentile(0.5), "p99": percentile(0.99), "max": percentile(1.0)},
+        }
+
+    async def dispatch(self, method, path, body):
+        parts = [part for part in path.split("?", 1)[0].split("/") if part]
+        if parts == ["grammars"] and method == "POST":
+            return await self.register(self.read_json(body))
+        if parts == ["grammars"] and method == "GET":
+            return HTTPStatus.OK, {"grammars": list(self.grammars)}
+        if len(parts) == 2 and parts[0] == "grammars" and method == "GET":
+            return HTTPStatus.OK, dict(self.lookup(parts[1])[0])
+        if len(parts) == 2 and parts[0] == "grammars" and method == "DELETE":
+            return self.delete(parts[1])
+        if len(parts) == 3 and parts[0] == "grammars" and parts[2] == "parse" and method == "POST":
+            return await self.parse(parts[1], self.read_json(body))
+        if parts == ["stats"] and method == "GET":
+            return HTTPStatus.OK, self.report()
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"{method} {path} no existe")
+
+    @staticmethod
+    def read_json(body):
+        try:
+            value = json.loads(body or b"{}")
+        except ValueError as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"JSON no válido: {e}")
+        if not isinstance(value, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "el cuerpo debe ser un objeto JSON")
+        return value
+
+    # ——— HTTP/1.1 mínimo: Content-Length y keep-alive, sin chunked ———
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    status = HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE
+                    await self.respond(writer, status, {"error": "cabecera demasiado grande"}, False)
+                    break
+                start = time.perf_counter()
+                method, path, version, headers = self.parse_head(head)
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                try:
+                    if "transfer-encoding" in headers:
+                        raise HTTPError(HTTPStatus.LENGTH_REQUIRED, "se necesita Content-Length")
+                    length = headers.get("content-length", "0")
+                    if not length.isdigit():
+                        keep_alive = False
+                        raise HTTPError(HTTPStatus.BAD_REQUEST, "Content-Length no válido")
+                    length = int(length)
+                    if length > MAX_BODY_BYTES:
+                        keep_alive = False
+                        message = f"cuerpo de más de {MAX_BODY_BYTES} bytes"
+                        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, message)
+                    body = await reader.readexactly(length) if length else b""
+                    status, payload = await self.dispatch(method, path, body)
+                    extra = ()
+                except HTTPError as e:
+                    status, payload, extra = e.status, {"error": str(e)}, e.headers
+                    self.stats["errors"] += 1
+                except asyncio.IncompleteReadError:
+                    break
+                except Exception as e:
+                    status, payload, extra = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(e).__name__}: {e}"}, ()
+                    self.stats["errors"] += 1
+                self.stats["requests"] += 1
+                await self.respond(writer, status, payload, keep_alive, extra)
+                self.latencies.append(time.perf_counter() - start)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    @staticmethod
+    def parse_head(head):
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, path, version = lines[0].split(" ")
+        except ValueError:
+            method, path, version = "", "/", "HTTP/1.0"
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(":")
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+        return method, path, version, headers
+
+    @staticmethod
+    async def respond(writer, status, payload, keep_alive, extra=()):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = [
+            f"HTTP/1.1 {status.value} {status.phrase}",
+            "Content-Type: application/json; charset=utf-8",
+            f"Content-Length: {len(body)}",
+            "Connection: " + ("keep-alive" if keep_alive else "close"),
+        ]
+        head += [f"{name}: {value}" for name, value in extra]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def start(self, host="127.0.0.1", port=8080):
+        """Empieza a escuchar; devuelve el asyncio.Server (port=0 elige uno libre)."""
+        return await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER_BYTES)
+
+    def close(self):
+        for _, grammar_file in self.grammars.values():
+            grammar_file.close()
+        self.grammars.clear()
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+        if self.own_dir:
+            shutil.rmtree(self.state_dir, ignore_errors=True)
+
+
+async def serve(host, port, workers=None, max_pending=None, state_dir=None):
+    service = ParseService(workers, max_pending, state_dir)
+    try:
+        server = await service.start(host, port)
+        address = server.sockets[0].getsockname()
+        print(f"Escuchando en http://{address[0]}:{address[1]}", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--workers", type=int, help="procesos para lotes grandes (por defecto, uno por CPU; 0 = ninguno)"
+    )
+    parser.add_argument("--max-pending", type=int, help="trabajos en cola o en curso antes de responder 503")
+    parser.add_argument("--state-dir", help="directorio de los ficheros binarios (por defecto, uno temporal)")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.max_pending, args.state_dir))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+# test_ll1.py
+"""Pruebas de regresión del núcleo (python -m pytest)."""
+
+import random
+
+import pytest
+
+import ll1
+
+# Gramática con conflictos y recursión que hacía crecer la pila en cada recuperación
+CONFLICTING_GRAMMAR = """
+n0 -> n0 c n0 | n3
+n1 -> n1 n1 c | ε
+n2 -> n3 | n3 d n2 n2
+n3 -> n4 a n2 | b a b
+n4 -> n1 | d
+"""
+
+
+class CountingProductions(list):
+    """
+    Cuerpos invertidos que cuentan cuántas veces los apila el driver (una por
+    expansión) y fallan en cuanto se pasa de limit, sin esperar a que termine.
+    """
+
+    def __init__(self, bodies, limit):
+        super().__init__(bodies)
+        self.limit = limit
+        self.expansions = 0
+
+    def __getitem__(self, p):
+        self.expansions += 1
+        assert self.expansions <= self.limit, "demasiadas expansiones"
+        return list.__getitem__(self, p)
+
+
+def test_diagnose_conflicting_table_is_linear():
+    compiled = ll1.analyze_grammar_text(CONFLICTING_GRAMMAR, "ε")["compiled"]
+    bodies = compiled.reversed_productions
+    r = random.Random(0)
+    prefix = "d d a c c zz b b d zz c d".split()
+    for _ in range(20):
+        tokens = prefix + [r.choice("a b c d zz".split()) for _ in range(188)]
+        # Antes: 40 tokens hacían millones de expansiones; ahora, 2(N+1) como mucho por token
+        limit = (len(tokens) + 1) * 2 * (compiled.n_nonterminals + 1)
+        compiled.reversed_productions = CountingProductions(bodies, limit)
+        errors = compiled.diagnose(tokens)
+        compiled.reversed_productions = bodies
+        accepted, position, expected = compiled.check(tokens)
+        assert not accepted
+        assert errors[0][0] == position and errors[0][2] == expected
+
+
+def test_diagnose_reports_every_error_in_one_pass():
+    text = "e -> t ep\nep -> + t ep | ε\nt -> f tp\ntp -> * f tp | ε\nf -> ( e ) | id"
+    compiled = ll1.analyze_grammar_text(text, "ε")["compiled"]
+    errors = compiled.diagnose("id + * id * ( id + ) * id + id id".split())
+    assert [(position, expected) for position, _, expected in errors] == [
+        (2, ("(", "id")),
+        (8, ("(", "id")),
+        (13, (")", "*", "+", "$")),
+    ]
+    assert compiled.diagnose("id + * id * ( id + ) * id + id id".split(), max_errors=1) == errors[:1]
+    assert compiled.diagnose("id * ( id + id )".split()) == []
+
+
+def test_repeated_alternatives_are_kept():
+    assert ll1.parse_grammar_with_scanner("s -> a\ns -> a | b", "ε") == {"s": [("a",), ("a",), ("b",)]}
+    report = ll1.grammar_report("s -> a | a", "ε")
+    assert report["ll1"] is False
+    assert report["conflicts"][0]["productions"] == ["a", "a"]
+
+
+def test_generated_descent_parser_reports_deep_nesting():
+    text = "e -> t ep\nep -> + t ep | ε\nt -> f tp\ntp -> * f tp | ε\nf -> ( e ) | id"
+    results = ll1.analyze_grammar_text(text, "ε")
+    namespace = {}
+    source = ll1.generate_parser(results["grammar"], results["table"], results["terminals"], "ε", "descent")
+    exec(compile(source, "parser.py", "exec"), namespace)
+    depth = 5000
+    tokens = ["("] * depth + ["id"] + [")"] * depth
+    assert results["compiled"].parse(tokens)[1] is None
+    position, message = namespace["parse"](tokens)[1]
+    assert 0 < position < depth and "anidamiento" in message
+
+
+def test_incremental_text_update_matches_full_analysis():
+    text = "e -> t ep\nep -> + t ep | ε\nt -> f tp\ntp -> * f tp | ε\nf -> ( e ) | id"
+    session = ll1.IncrementalAnalysis({}, "ε")
+    session.update_text(text)
+    edited = text.replace("f -> ( e ) | id", "f -> ( e ) | id | num")
+    session.update_text(edited)
+    results = session.results()
+    assert "compiled" not in results
+    full = ll1.analyze_grammar_text(edited, "ε")
+    for key in ("first", "follow", "table", "terminals", "start"):
+        assert results[key] == full[key]
+    assert results["compiled"].check("num * ( id + num )".split())[0]
+
+
+def test_trace_rows_show_a_bounded_window():
+    text = "e -> t ep\nep -> + t ep | ε\nt -> f tp\ntp -> * f tp | ε\nf -> ( e ) | id"
+    compiled = ll1.analyze_grammar_text(text, "ε")["compiled"]
+    tokens = ["("] * 50 + ["id"] + [")"] * 50
+    store = ll1.TraceStore(compiled, tokens, window=5)
+    ll1.run_parse(compiled, tokens, store)
+    assert store[0]["Input"] == "( ( ( ( ( … $"
+    deep = store[len(store) // 2]
+    assert deep["Stack"].startswith("… ") and len(deep["Stack"].split()) == 6
+    assert store.row(0)["Input"] == " ".join(tokens + ["$"])
+
+
+def test_empty_grammar_is_a_value_error():
+    for text in ("", "\n  \n"):
+        with pytest.raises(ValueError, match="no tiene reglas"):
+            ll1.analyze_grammar_text(text, "ε")
+
+
+def test_truncated_binary_grammar_is_a_value_error(tmp_path):
+    text = "e -> t ep\nep -> + t ep | ε\nt -> f tp\ntp -> * f tp | ε\nf -> ( e ) | id"
+    path = tmp_path / "g.ll1"
+    ll1.save_grammar_binary(str(path), text, "ε")
+    data = path.read_bytes()
+    for size in range(len(ll1.GRAMMAR_FILE_MAGIC), len(data), 5):
+        path.write_bytes(data[:size])
+        with pytest.raises(ValueError):
+            ll1.load_grammar_binary(str(path))
+
+
+def test_incremental_results_follow_grammar_order():
+    session = ll1.IncrementalAnalysis({}, "ε")
+    session.update_text("a -> b x\nb -> y")
+    for text in ("c -> a\na -> b x\nb -> y", "c -> a\nb -> y\na -> b x"):
+        session.update_text(text)
+        results, full = session.results(), ll1.analyze_grammar_text(text, "ε")
+        for key in ("grammar", "first", "follow", "table"):
+            assert list(results[key]) == list(full[key])
+        assert results["compiled"].symbols == full["compiled"].symbols
@@ -0,0 +1,100 @@
+# test_server.py
+"""Pruebas del servicio HTTP (python -m pytest): ParseService(workers=0) en un puerto libre."""
+
+import asyncio
+import json
+
+import server
+
+GRAMMAR = "e -> t ep\nep -> + t ep | ε\nt -> f tp\ntp -> * f tp | ε\nf -> ( e ) | id"
+
+
+async def request(port, method, path, payload=None):
+    """(estado, cabeceras, JSON) de una petición con Connection: close; payload en bytes se envía tal cual."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = payload if isinstance(payload, bytes) else b"" if payload is None else json.dumps(payload).encode("utf-8")
+    head = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    await writer.wait_closed()
+    head, _, body = response.partition(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    headers = dict(line.split(": ", 1) for line in lines[1:])
+    return int(lines[0].split()[1]), headers, json.loads(body)
+
+
+def run_service(scenario, **options):
+    """Arranca el servicio sin pool, ejecuta scenario(service, puerto) y lo cierra."""
+
+    async def main():
+        service = server.ParseService(workers=0, **options)
+        listener = await service.start(port=0)
+        try:
+            async with listener:
+                await scenario(service, listener.sockets[0].getsockname()[1])
+        finally:
+            service.close()
+
+    asyncio.run(main())
+
+
+def test_register_and_parse():
+    async def scenario(service, port):
+        status, _, info = await request(port, "POST", "/grammars", {"grammar": GRAMMAR})
+        assert status == 201 and info["ll1"] and info["start"] == "e"
+        grammar_id = info["id"]
+        status, _, again = await request(port, "POST", "/grammars", {"grammar": GRAMMAR})
+        assert status == 200 and again["id"] == grammar_id
+        assert (await request(port, "GET", "/grammars"))[2] == {"grammars": [grammar_id]}
+
+        parse = f"/grammars/{grammar_id}/parse"
+        status, _, result = await request(port, "POST", parse, {"input": "id + id * id"})
+        assert status == 200 and result == {"accepted": True, "position": None, "expected": []}
+        status, _, result = await request(port, "POST", parse, {"tokens": ["id", "+"]})
+        assert result == {"accepted": False, "position": 2, "expected": ["(", "id"]}
+        status, _, batch = await request(port, "POST", parse, {"inputs": ["( id )", ["id", "id"], "id *"]})
+        assert status == 200 and [r["accepted"] for r in batch["results"]] == [True, False, False]
+        assert [r["position"] for r in batch["results"]] == [None, 1, 2]
+
+        status, _, deleted = await request(port, "DELETE", f"/grammars/{grammar_id}")
+        assert status == 200 and deleted == {"deleted": grammar_id}
+        assert (await request(port, "POST", parse, {"input": "id"}))[0] == 404
+
+    run_service(scenario)
+
+
+def test_bad_requests():
+    async def scenario(service, port):
+        status, _, info = await request(port, "POST", "/grammars", {"grammar": GRAMMAR})
+        parse = f"/grammars/{info['id']}/parse"
+        for path, payload in [
+            ("/grammars", {"grammar": 3}),
+            ("/grammars", {"grammar": "s -> a -> b"}),
+            ("/grammars", b"{no es json"),
+            (parse, {}),
+            (parse, {"inputs": "id"}),
+            (parse, {"tokens": ["id", 1]}),
+        ]:
+            status, _, error = await request(port, "POST", path, payload)
+            assert status == 400 and error["error"], (path, payload)
+        for method, path in [("GET", "/grammars/nada"), ("POST", "/grammars/nada/parse"), ("GET", "/otra")]:
+            status, _, error = await request(port, method, path, {"input": "id"} if method == "POST" else None)
+            assert status == 404 and error["error"]
+
+    run_service(scenario)
+
+
+def test_saturated_service_is_503():
+    async def scenario(service, port):
+        # Como si ya hubiera max_pending trabajos en cola o en curso
+        service.pending = service.max_pending
+        status, headers, error = await request(port, "POST", "/grammars", {"grammar": GRAMMAR})
+        assert status == 503 and headers["Retry-After"] == "1" and error["error"]
+        service.pending = 0
+        assert (await request(port, "POST", "/grammars", {"grammar": GRAMMAR}))[0] == 201
+        status, _, stats = await request(port, "GET", "/stats")
+        assert stats["overloaded"] == 1 and stats["pending"] == 0 and stats["max_pending"] == 2
+
+    run_service(scenario, max_pending=2)